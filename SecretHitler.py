@@ -1,4 +1,18 @@
+import collections
+import math
+import pickle
 import random
+import time
+
+import gamelog
+
+# Number of each role for every supported player count.
+ROLES = {5: {"Liberal": 3, "Fascist": 1, "Hitler": 1},
+         6: {"Liberal": 4, "Fascist": 1, "Hitler": 1},
+         7: {"Liberal": 4, "Fascist": 2, "Hitler": 1},
+         8: {"Liberal": 5, "Fascist": 2, "Hitler": 1},
+         9: {"Liberal": 5, "Fascist": 3, "Hitler": 1},
+         10: {"Liberal": 6, "Fascist": 3, "Hitler": 1}}
 
 """
 The GameBoard Object controls the overall playspace of the game. It sets up the game initially
@@ -9,40 +23,69 @@ understand what is currently going on in the game.
 
 class GameBoard(object):
 
+    __slots__ = ("state", "players", "playerList", "roles", "deck", "reshuffles", "cache", "log", "gameNumber", "round",
+                 "rng", "seats", "sus", "belief")
+
     def __init__(self, pl, isRandom, isRole,
-                 isIntelligent):  # This defines the types of players which is included in the game
+                 isIntelligent, log=None, rng=None, roles=None, isMCTS=False, heuristics=None,
+                 isBayesian=False):  # This defines the types of players which is included in the game. rng is where
+        # every random choice comes from, a seeded random.Random makes the game repeatable. roles can give the role of
+        # each player in order instead of dealing them at random. heuristics can give each player their own type by name
+        # (see HEURISTICS), None for any player leaves them to the flags.
         self.state = GameState(len(pl), 6, 11)
         self.players = self.state.players
-        self.playerList = pl
+        self.playerList = list(pl)  # Copied so the names passed in aren't replaced by Player objects between games
         self.roles = {}
-        self.deck = []
+        self.deck = PolicyDeck()
+        self.reshuffles = 0
+        self.cache = OUTCOMES  # Shared by every board in this process, swap it out for a separate cache
+        self.log = log if log is not None else gamelog.NULL_LOG
+        self.gameNumber = 0  # Kept up to date by the GamePlayer so events can say where they came from
+        self.round = 0
+        self.rng = rng if rng is not None else random  # The random module itself works as an unseeded default
+        self.seats = []  # Player ids in seating order, set by the GamePlayer
+        self.sus = None  # Sus matrix of Intelligent Player games, see susmatrix.py
+        self.belief = None  # Role posteriors of Bayesian Player games, see belief.py
 
         self.createRoles()
-        self.assignRoles(isRandom, isRole, isIntelligent)
+        self.assignRoles(isRandom, isRole, isIntelligent, roles, isMCTS, heuristics, isBayesian)
 
         self.updateState()
+        if any(isinstance(x, IntelligentRolePlayer) for x in self.playerList):
+            self.createSus()
+        if any(isinstance(x, BayesianRolePlayer) for x in self.playerList):
+            self.createBelief()
 
         self.deck = self.createDeck()
 
         self.updateState()
 
+    # NumPy is only needed for Intelligent games so it is imported here. Ties between equally sus players go the same
+    # way as they always have, to whoever comes first in playerDict.
+    def createSus(self):
+        import susmatrix
+        cls = IntelligentRolePlayer
+        dtype = susmatrix.susDtype(cls.libWeight, cls.fasWeight, cls.susFloor)
+        self.sus = susmatrix.SusMatrix(self.players, dtype, list(self.state.playerDict.values()))
+
+    # Also NumPy, so only imported for Bayesian games. Every player's posterior starts from what their role lets them
+    # know.
+    def createBelief(self):
+        import belief
+        cls = BayesianRolePlayer
+        self.belief = belief.Belief([x.role for x in self.playerList], cls.libPlaysLib, cls.fasPlaysLib)
+
+    # Whether any player is listening for the policies chancellors play, see GamePlayer.broadcast.
+    @property
+    def listening(self):
+        return self.sus is not None or self.belief is not None
+
     # The Game supports a maximum of 10 players with differing numbers of both factions
     def createRoles(self):
-        if self.players == 5:
-            self.roles = {"Liberal": 3, "Fascist": 1, "Hitler": 1}
-        elif self.players == 6:
-            self.roles = {"Liberal": 4, "Fascist": 1, "Hitler": 1}
-        elif self.players == 7:
-            self.roles = {"Liberal": 4, "Fascist": 2, "Hitler": 1}
-        elif self.players == 8:
-            self.roles = {"Liberal": 5, "Fascist": 2, "Hitler": 1}
-        elif self.players == 9:
-            self.roles = {"Liberal": 5, "Fascist": 3, "Hitler": 1}
-        elif self.players == 10:
-            self.roles = {"Liberal": 6, "Fascist": 3, "Hitler": 1}
+        self.roles = dict(ROLES.get(self.players, {}))
 
     # On initial creation of the Game Board object all players are assigned with their roles
-    def assignRoles(self, isRandom, isRole, isIntelligent):
+    def assignRoles(self, isRandom, isRole, isIntelligent, roles=None, isMCTS=False, heuristics=None, isBayesian=False):
         c = 0
         for player in self.playerList:
             if any(x == 0 for x in self.roles.values()):
@@ -50,16 +93,25 @@ class GameBoard(object):
                     if self.roles[key] == 0:
                         del self.roles[key]
                         break
-            role = random.choice(list(self.roles.keys()))
-            if isRandom:
+            if roles is not None:
+                role = roles[c]
+            else:
+                role = self.rng.choice(list(self.roles.keys()))
+            if heuristics is not None and heuristics[c] is not None:
+                self.playerList[c] = HEURISTICS[heuristics[c]](player, role, self)
+            elif isRandom:
                 self.playerList[c] = RandomPlayer(player, role, self)  # Different versions of the game use players
                 # with different heuristics
             elif isRole:
                 self.playerList[c] = RolePlayer(player, role, self)
             elif isIntelligent:
                 self.playerList[c] = IntelligentRolePlayer(player, role, self)
+            elif isMCTS:
+                self.playerList[c] = MCTSPlayer(player, role, self)
+            elif isBayesian:
+                self.playerList[c] = BayesianRolePlayer(player, role, self)
             else:
-                self.playerList[c] = Player(player, role)
+                self.playerList[c] = Player(player, role, self)
             self.roles[role] -= 1
             c += 1
 
@@ -71,36 +123,35 @@ class GameBoard(object):
             playerId = 0
 
             for player in self.playerList:
-                if player.role == "Liberal":
-                    self.state.lib[player] = playerId
-                    player.updateId(playerId)
-                else:
-                    self.state.fas[player] = playerId
-                    player.updateId(playerId)
+                player.updateId(playerId)
                 playerId += 1
                 self.state.rolesApplied = True
 
-            self.state.playerDict = dict(list(self.state.lib.items()) + list(self.state.fas.items()))  # Both
-            # dictionaries hold the Player object with and Id key
-            self.state.IdDict = dict((y, x) for x, y in
-                                     self.state.playerDict.items())  # And a Id int by player key, as both id's and
-            # names are used interchangeably for different functions
+            # The players are held once, by id, with the ids of each side alongside. The lib, fas, playerDict and
+            # IdDict dictionaries are made from these when asked for.
+            self.state.roster = self.playerList  # The player list is already in id order
+            self.state.libIds = tuple(x.getId() for x in self.playerList if x.role == "Liberal")
+            self.state.fasIds = tuple(x.getId() for x in self.playerList if x.role != "Liberal")
 
         self.state.deck = self.deck
         self.state.setStateCode()
 
+    # Sends an event to the log. Callers check self.log.enabled(level) first so nothing is built when nobody listens.
+    def emit(self, kind, level, **data):
+        self.log.emit(gamelog.Event(kind, level, self.state, self.gameNumber, self.round, **data))
+
     # A Deck is created which will be utilised and shuffled in further methods
     def createDeck(self):
 
-        deck = []
+        deck = PolicyDeck()
 
         # The deck is populated with policy objects
         for policy in range(0, self.state.libPol):
-            deck.append(Policy("Liberal"))
+            deck.append(LIBERAL)
         for policy in range(0, self.state.fasPol):
-            deck.append(Policy("Fascist"))
+            deck.append(FASCIST)
 
-        random.shuffle(deck)
+        deck.shuffle(self.rng)
 
         return deck
 
@@ -113,6 +164,8 @@ used as a numeric for creating state codes but the card name is used for readabi
 
 class Policy(object):
 
+    __slots__ = ("name", "id")
+
     def __init__(self, name):
         self.name = name
         if name == "Liberal":
@@ -127,6 +180,95 @@ class Policy(object):
         return self.id
 
 
+# There are only two kinds of card so every deck shares these two Policy objects rather than making one per card.
+LIBERAL = Policy("Liberal")
+FASCIST = Policy("Fascist")
+POLICIES = {1: LIBERAL, 2: FASCIST, ord("1"): LIBERAL, ord("2"): FASCIST}
+
+
+"""
+A Policy Deck holds a pile of cards (the deck or the discard pile) as a bytearray of the same "1" and "2" characters the
+state code uses, the first card being the top of the pile. Cards go in and come out as the shared Policy objects above,
+so the rest of the game can treat it like the list of Policy objects it used to be. Drawing from the top is cheap as a
+bytearray can drop bytes from its front without moving the rest.
+"""
+
+
+class PolicyDeck(object):
+
+    __slots__ = ("cards", "version")
+
+    def __init__(self, code=""):
+        self.cards = bytearray(code, "ascii") if isinstance(code, str) else bytearray(code)
+        self.version = 0  # Goes up every time the cards change, see GameState.version
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __iter__(self):
+        for x in self.cards:
+            yield POLICIES[x]
+
+    def __getitem__(self, index):
+        return POLICIES[self.cards[index]]
+
+    def __delitem__(self, index):
+        del self.cards[index]
+        self.version += 1
+
+    def __add__(self, other):
+        deck = PolicyDeck(self.cards)
+        deck.extend(other)
+        return deck
+
+    def append(self, policy):
+        self.cards.append(48 + policy.getId())
+        self.version += 1
+
+    def extend(self, policies):
+        if isinstance(policies, PolicyDeck):
+            self.cards += policies.cards
+            self.version += 1
+        else:
+            for policy in policies:
+                self.append(policy)
+
+    # Takes number cards off the top of the deck.
+    def draw(self, number=3):
+        hand = [POLICIES[x] for x in self.cards[:number]]
+        del self.cards[:number]
+        self.version += 1
+        return hand
+
+    def pop(self, index=-1):
+        self.version += 1
+        return POLICIES[self.cards.pop(index)]
+
+    def shuffle(self, rng=random):
+        rng.shuffle(self.cards)
+        self.version += 1
+
+    def copy(self):
+        return PolicyDeck(self.cards)
+
+    # The deck as it appears in a state code.
+    def code(self):
+        return self.cards.decode("ascii")
+
+    # The deck as it is packed into a state key, see packPolicies.
+    def bits(self):
+        if not self.cards:
+            return 0
+        return (len(self.cards) << 17) | int(self.cards.translate(CODE_TO_BIT), 2)
+
+    def __str__(self):
+        return self.code()
+
+
+CODE_TO_BIT = bytes.maketrans(b"12", b"01")
+BIT_TO_CODE = str.maketrans("01", "12")
+
+
 """
 Player objects are inherited by objects which use apply certain heuristics to the actions taken in the object here
 
@@ -138,6 +280,8 @@ the result and use the differently. Such as selecting a random card, or an infor
 
 class Player(object):
 
+    __slots__ = ("name", "role", "GB", "id", "isPresident", "isChancellor", "isTermLimited")
+
     def __init__(self, name, role, GB):
         self.name = name
         self.role = role
@@ -149,72 +293,125 @@ class Player(object):
 
     def drawCards(self):
 
-        hand = []
-
         if len(self.GB.state.deck) < 3:  # Reshuffle the deck if there is less than 3 cards.
-            print("Shuffling in Progress")
+            self.GB.reshuffles += 1
             tmp = self.GB.state.deck + self.GB.state.discardDeck
-            random.shuffle(tmp)
+            tmp.shuffle(self.GB.rng)
             self.GB.state.deck = tmp
-            self.GB.state.discardDeck = []
+            self.GB.state.discardDeck = PolicyDeck()
+            if self.GB.log.enabled(gamelog.INFO):
+                self.GB.emit(gamelog.RESHUFFLE, gamelog.INFO, player=str(self), deck=tmp.code())
 
-        for x in range(0, 3):  # The game rules dictate the drawing of three cards
-            try:
-                hand.append(self.GB.state.deck.pop(x))
-            except IndexError:
-                hand.append(self.GB.state.deck.pop(0))
+        hand = self.GB.state.deck.draw(3)  # The game rules dictate the drawing of three cards, from the top
 
         return hand
 
     # In order to present options to the player we need to know all possible moves that player has from any given
     # position. In this case, everything that might happen should you choose to play a card that you have drawn.
     # The implications range from the played card and discard deck make up.
+    #
+    # Each candidate plays a random card from the hand, so a card can come up more than once or not at all.
     def generatePSCHand(self, hand):
 
-        currentState = self.GB.state.createString()
+        cache = self.GB.cache
+        if cache.maxsize > 0:  # Off by default, when there is no point making the key
+            key = ("hand", self.GB.state.createKey(), tuple(x.getId() for x in hand))
+            options = cache.get(key)
+            if options is None:
+                options = self.handOutcomes(hand)
+                cache.put(key, options)
+        else:
+            options = self.handOutcomes(hand)
 
         PSC = []
-        discard = []
 
         for x in hand:
-            random.shuffle(hand)
-            chosenCard = hand[0]
-            discard.append(hand[1])
-            discard.append(hand[2])
-            self.discard(discard)
-            discard = []
-            self.play(chosenCard)
-            chosenCard = None
-            PSC.append(self.GB.state.createString())
-            # self.flushHand()
-            self.rollback(currentState)  # In order to generate we actually DO each of the options and then take the
-            # current state of that possible future. In that case we then need to rollback any actions we took.
+            PSC.append(options[self.GB.rng.randrange(len(options))])
 
         return PSC
 
+    # Every outcome of a hand in order, option x is playing hand[x] and discarding the other two.
+    def handOutcomes(self, hand):
+
+        options = []
+
+        for x in range(0, len(hand)):
+            mark = self.GB.state.begin()
+            self.discard(hand[:x] + hand[x + 1:])
+            self.play(hand[x])
+            options.append(self.GB.state.createString())
+            # self.flushHand()
+            self.undo(mark)  # In order to generate we actually DO each of the options and then take the current
+            # state of that possible future. In that case we then need to undo any actions we took.
+
+        return tuple(options)
+
     # The other possible action is to elect a candidate. Candidates cannot be themselves, so this should limit who is
     # a possible candidate.
     def generatePSCElection(self, candidateList):
 
-        currentState = self.GB.state.createString()
+        cache = self.GB.cache
+        if cache.maxsize > 0:
+            key = ("election", self.GB.state.createKey(), tuple(candidateList.values()))
+            PSC = cache.get(key)
+            if PSC is not None:
+                return list(PSC)  # A copy, as the players shuffle the list they are given
 
         PSC = []
 
         for x in candidateList:
-            self.GB.state.chancellor = candidateList[x]
+            if candidateList[x] == self.GB.state.president:  # Skip any State Codes which would have the chancellor
+                # elected the same as the sitting president.
+                continue
+            mark = self.GB.state.begin()
+            self.GB.state.setField("chancellor", candidateList[x])
             PSC.append(self.GB.state.createString())
             # self.flushElection()
-            self.rollback(currentState)  # Rollback needed
+            self.undo(mark)  # Undo needed
+
+        if cache.maxsize > 0:
+            cache.put(key, tuple(PSC))
+
+        return PSC
+
+    # Finds the outcome which meets the goal, "l+1" for a Liberal policy or "f+1" for a Fascist one, by comparing each
+    # possible future with the current played cards. Returns None if none of them do. This is the same for any state
+    # and set of futures so it is cached too.
+    def goalOutcome(self, PSC, goal):
+
+        # Define the Current Played Cards to compare possible futures to
+        currentlib = self.GB.state.playedLib
+        currentfas = self.GB.state.playedFas
+
+        cache = self.GB.cache
+        if cache.maxsize > 0:
+            key = ("goal", tuple(PSC), goal, currentlib, currentfas)
+            outcome = cache.get(key)
+            if outcome is not None:
+                return outcome or None  # An empty string is stored when no outcome meets the goal
+
+        actions = []
 
-        count = 0
         for x in PSC:
-            splitcode = x.split("/")
-            if int(splitcode[8]) == int(splitcode[9]):  # Find any State Codes which have the chancellor elected the
-                # same as the sitting president and delete it.
-                del PSC[count]
+            splitstring = x.split("/")
+            lib = splitstring[6]
+            fas = splitstring[7]
+            if int(lib) - currentlib == 1:
+                actions.append("l+1")  # Create a list of actions and which goal each one fulfils.
+            elif int(fas) - currentfas == 1:
+                actions.append("f+1")
+
+        count = 0
+        outcome = None
+        for x in actions:
+            if x == goal:
+                outcome = PSC[count]  # Selects as outcome the Action which Meets the goal
             count += 1
 
-        return PSC
+        if cache.maxsize > 0:
+            cache.put(key, outcome or "")
+
+        return outcome
 
     # Unused Functions
     def flushHand(self):
@@ -227,6 +424,9 @@ class Player(object):
     def rollback(self, stateCode):
         self.GB.state.rollback(stateCode)
 
+    def undo(self, mark):
+        self.GB.state.undo(mark)
+
     def discard(self, deck):
         self.GB.state.updateDiscardDeck(deck)
 
@@ -252,66 +452,125 @@ the correct information exists here to adapt into a more complex program.
 
 class GameState(object):
 
+    __slots__ = ("_players", "_libPol", "_fasPol", "roster", "_libIds", "_fasIds", "_deck", "_discardDeck",
+                 "_playedLib", "_playedFas", "_president", "_chancellor", "_termLimited", "votesFailed", "veto",
+                 "undoLog", "transactions", "rolesApplied", "changes", "dirty", "codeParts", "deckVersion",
+                 "discardVersion", "code", "codeVersion")
+
     def __init__(self, p, lp, fp):
         # I won't explain all of the different variables into detail but they will translate into a state code.
-        self.players = p
-        self.libPol = lp
-        self.fasPol = fp
-        self.lib = {}
-        self.fas = {}
-        self.playerDict = {}
-        self.IdDict = {}
-        self.deck = []
-        self.discardDeck = []
-        self.playedLib = 0
-        self.playedFas = 0
-        self.president = None
-        self.chancellor = None
-        self.termLimited = None
+        # The fields in the state code are set through their slots here, after this they are set through the tracked
+        # properties below.
+        self._players = p
+        self._libPol = lp
+        self._fasPol = fp
+        self.roster = []  # Player objects by id
+        self._libIds = ()
+        self._fasIds = ()
+        self._deck = PolicyDeck()
+        self._discardDeck = PolicyDeck()
+        self._playedLib = 0
+        self._playedFas = 0
+        self._president = None
+        self._chancellor = None
+        self._termLimited = None
         self.votesFailed = 0
         self.veto = False
-        self.statecode = None
+        self.undoLog = []  # Changes made since the outermost begin(), see Transactions below.
+        self.transactions = 0
 
         self.rolesApplied = False
 
+        # The cached state code, see Tracking below.
+        self.changes = 0
+        self.dirty = ALL_SEGMENTS
+        self.codeParts = ["", "", "", ""]
+        self.deckVersion = -1
+        self.discardVersion = -1
+        self.code = None
+        self.codeVersion = -1
+
+    # Goes up by at least one every time anything in the state code changes, including cards going in or out of either
+    # pile. Comparing versions is a cheap way to see whether anything has happened since.
+    @property
+    def version(self):
+        return self.changes + self._deck.version + self._discardDeck.version
+
+    # The player maps as they used to be kept, Player object: id for each side and both (Liberals first), and id:
+    # Player object.
+    @property
+    def lib(self):
+        return dict((self.roster[x], x) for x in self.libIds)
+
+    @property
+    def fas(self):
+        return dict((self.roster[x], x) for x in self.fasIds)
+
+    @property
+    def playerDict(self):
+        return dict((self.roster[x], x) for x in self.libIds + self.fasIds)
+
+    @property
+    def IdDict(self):
+        return dict((x, self.roster[x]) for x in self.libIds + self.fasIds)
+
+    # The Player with the given id, None for anything that isn't one ("X" or None).
+    def player(self, id):
+        if isinstance(id, int) and 0 <= id < len(self.roster):
+            return self.roster[id]
+        return None
+
     # State Code Creator. The State Code is central information in the game. We can jump around states provided that
     # a code if given for where you want to go. A full explanation of the state code will be given in the report.
+    #
+    # The code is cached and only the segments which have changed since it was last made are built again.
     def createString(self):
-        code = str(self.players) + "/" + str(self.libPol) + "." + str(self.fasPol) + "/"
-        for lib in self.lib:
-            code = code + str(lib.getId()) + "-"
-        code += "/" # State Code separator
-        for fas in self.fas:
-            code = code + str(fas.getId()) + "-"
-        code += "/"
-        for policy in self.deck:
-            code = code + str(policy.getId())
-        code += "/"
-        for policy in self.discardDeck:
-            code = code + str(policy.getId())
-        code += "/"
-        code += str(self.playedLib)
-        code += "/"
-        code += str(self.playedFas)
-        code += "/"
-        if self.president is None:
-            code += "X"
-        else:
-            code = code + str(self.president)
-        code += "/"
-        if self.chancellor is None:
-            code += "X"
-        else:
-            code = code + str(self.chancellor)
-        code += "/"
-        if self.termLimited is None:
-            code += "X"
-        else:
-            code = code + str(self.termLimited)
+        version = self.version
+        if version == self.codeVersion:
+            return self.code
+
+        dirty = self.dirty
+        parts = self.codeParts
+        if dirty & HEAD_SEGMENT:
+            code = str(self._players) + "/" + str(self._libPol) + "." + str(self._fasPol) + "/"
+            for lib in self._libIds:
+                code = code + str(lib) + "-"
+            code += "/" # State Code separator
+            for fas in self._fasIds:
+                code = code + str(fas) + "-"
+            parts[0] = code
+        if dirty & DECK_SEGMENT or self._deck.version != self.deckVersion:
+            parts[1] = self._deck.code()
+            self.deckVersion = self._deck.version
+        if dirty & DISCARD_SEGMENT or self._discardDeck.version != self.discardVersion:
+            parts[2] = self._discardDeck.code()
+            self.discardVersion = self._discardDeck.version
+        if dirty & TAIL_SEGMENT:
+            code = str(self._playedLib)
+            code += "/"
+            code += str(self._playedFas)
+            code += "/"
+            if self._president is None:
+                code += "X"
+            else:
+                code = code + str(self._president)
+            code += "/"
+            if self._chancellor is None:
+                code += "X"
+            else:
+                code = code + str(self._chancellor)
+            code += "/"
+            if self._termLimited is None:
+                code += "X"
+            else:
+                code = code + str(self._termLimited)
+            parts[3] = code
+        self.dirty = 0
 
         # Essentially we have converted each variable into a number than we can output and use.
-
-        return code
+        self.code = parts[0] + "/" + parts[1] + "/" + parts[2] + "/" + parts[3]
+        self.codeVersion = version
+        return self.code
 
     # Read String is the converse to Creation. This takes an output of the previous string and then sets all the
     # variables as per they have been encoded.
@@ -320,29 +579,14 @@ class GameState(object):
     def readString(self, string):
         splitstring = string.split("/")
 
-        self.players = splitstring[0]
+        self.players = int(splitstring[0])
 
         polNum = splitstring[1].split(".")
-        self.libPol = polNum[0]
-        self.fasPol = polNum[1]
-
-        deck = []
-        for x in splitstring[4]:
-            if x == str(1):
-                deck.append(Policy("Liberal"))
-            else:
-                deck.append(Policy("Fascist"))
+        self.libPol = int(polNum[0])
+        self.fasPol = int(polNum[1])
 
-        self.deck = deck
-
-        deck = []
-        for x in splitstring[5]:
-            if x == str(1):
-                deck.append(Policy("Liberal"))
-            else:
-                deck.append(Policy("Fascist"))
-
-        self.discardDeck = deck
+        self.deck = PolicyDeck(splitstring[4])
+        self.discardDeck = PolicyDeck(splitstring[5])
 
         self.playedLib = int(splitstring[6])
         self.playedFas = int(splitstring[7])
@@ -362,18 +606,25 @@ class GameState(object):
 
     # Update Functions
     def updateDiscardDeck(self, deck):
+        if self.transactions:
+            self.undoLog.append(("discardDeck", len(self.discardDeck), None))
         for x in deck:
             self.discardDeck.append(x)
 
     def updatePlayedCards(self, card):
         if card.getId() == 1:
-            self.playedLib += 1
+            self.setField("playedLib", self.playedLib + 1)
         else:
-            self.playedFas += 1
+            self.setField("playedFas", self.playedFas + 1)
+
+    def setField(self, name, value):
+        if self.transactions:
+            self.undoLog.append((name, None, getattr(self, name)))
+        setattr(self, name, value)
 
     # Unused Functions
     def flushHand(self):
-        self.discardDeck = []
+        self.discardDeck = PolicyDeck()
         self.playedLib = 0
         self.playedFas = 0
 
@@ -384,14 +635,305 @@ class GameState(object):
     def rollback(self, stateCode):
         self.readString(stateCode)
 
-    # Getters and Setters
-    def setStateCode(self):
+    # Transactions. Between begin() and undo() every change made through the update functions is written to the undo
+    # log as the field and its old value (or the old length for piles that were appended to). Undoing then only has
+    # to reverse what actually changed rather than reading back a whole state code. Transactions can be nested, each
+    # begin() returns the mark that its undo() should wind back to.
+    def begin(self):
+        self.transactions += 1
+        return len(self.undoLog)
+
+    def undo(self, mark):
+        while len(self.undoLog) > mark:
+            name, length, value = self.undoLog.pop()
+            if length is not None:
+                del getattr(self, name)[length:]
+            else:
+                setattr(self, name, value)
+        self.transactions -= 1
 
-        self.statecode = self.createString()
+    # Getters and Setters. The state code is made when it is asked for, so there is nothing to set any more.
+    def setStateCode(self):
+        pass
 
     def getStateCode(self):
 
-        return self.statecode
+        return self.createString()
+
+    @property
+    def statecode(self):
+        return self.createString()
+
+    # State Key Creator. This is the packed version of the state code, every field is given a fixed number of bits in
+    # a single integer so it can be hashed, compared and stored without building a string. See KEY_FIELDS below.
+    def createKey(self):
+        fasMask = 0
+        for fas in self.fasIds:
+            fasMask |= 1 << fas
+
+        key = int(self.players)
+        key = (key << 5) | int(self.libPol)
+        key = (key << 5) | int(self.fasPol)
+        key = (key << 1) | bool(self.libIds or self.fasIds)
+        key = (key << 10) | fasMask
+        key = (key << 22) | packPolicies(self.deck)
+        key = (key << 22) | packPolicies(self.discardDeck)
+        key = (key << 3) | self.playedLib
+        key = (key << 3) | self.playedFas
+        key = (key << 4) | packSeat(self.president)
+        key = (key << 4) | packSeat(self.chancellor)
+        key = (key << 4) | packSeat(self.termLimited)
+
+        return key
+
+    # Read Key is the converse of createKey and works the same way as readString. The player maps are left alone as
+    # they hold the Player objects which can't be packed into a number.
+    def readKey(self, key):
+        fields = unpackKey(key)
+
+        self.players = fields["players"]
+        self.libPol = fields["libPol"]
+        self.fasPol = fields["fasPol"]
+        self.deck = unpackPolicies(fields["deck"])
+        self.discardDeck = unpackPolicies(fields["discardDeck"])
+        self.playedLib = fields["playedLib"]
+        self.playedFas = fields["playedFas"]
+        self.president = fields["president"]
+        if self.president == "X":
+            self.president = None
+        self.chancellor = fields["chancellor"]
+        self.termLimited = fields["termLimited"]
+
+        self.setStateCode()
+
+
+"""
+Tracking. Every field that goes into the state code is a property over its slot. Setting one to a new value marks its
+segment of the code as dirty and counts as a change for the version. The piles have a version of their own which goes
+up whenever cards go in or out, so changes made to them in place are seen as well.
+"""
+
+HEAD_SEGMENT = 1  # Players, policy numbers and each side's ids
+DECK_SEGMENT = 2
+DISCARD_SEGMENT = 4
+TAIL_SEGMENT = 8  # Played cards, president, chancellor and term limited player
+ALL_SEGMENTS = 15
+
+TRACKED_FIELDS = [("players", HEAD_SEGMENT), ("libPol", HEAD_SEGMENT), ("fasPol", HEAD_SEGMENT),
+                  ("libIds", HEAD_SEGMENT), ("fasIds", HEAD_SEGMENT), ("deck", DECK_SEGMENT),
+                  ("discardDeck", DISCARD_SEGMENT), ("playedLib", TAIL_SEGMENT), ("playedFas", TAIL_SEGMENT),
+                  ("president", TAIL_SEGMENT), ("chancellor", TAIL_SEGMENT), ("termLimited", TAIL_SEGMENT)]
+
+
+def trackedField(name, segment):
+    slot = GameState.__dict__["_" + name]
+    get = slot.__get__
+    put = slot.__set__
+
+    if segment == DECK_SEGMENT or segment == DISCARD_SEGMENT:
+        # A new pile starts from its own version, the old pile's is kept in changes so the version never goes down.
+        def setter(self, value):
+            self.changes += get(self).version + 1
+            put(self, value)
+            self.dirty |= segment
+    else:
+        def setter(self, value):
+            if get(self) != value:
+                put(self, value)
+                self.changes += 1
+                self.dirty |= segment
+
+    return property(get, setter)
+
+
+for name, segment in TRACKED_FIELDS:
+    setattr(GameState, name, trackedField(name, segment))
+
+
+"""
+State Keys are a packed alternative to the state code. The whole state is held in one integer (KEY_BYTES wide when
+turned into bytes) so it can be used as a dictionary key or compared in constant time. Keys and state codes convert
+into each other without losing anything, so older logs of state codes can still be read.
+
+Fields are listed from the most significant bits down as (name, width).
+"""
+
+KEY_FIELDS = [("players", 4), ("libPol", 5), ("fasPol", 5), ("rolesApplied", 1), ("fasMask", 10), ("deck", 22),
+              ("discardDeck", 22), ("playedLib", 3), ("playedFas", 3), ("president", 4), ("chancellor", 4),
+              ("termLimited", 4)]
+KEY_BITS = sum(width for name, width in KEY_FIELDS)
+KEY_BYTES = (KEY_BITS + 7) // 8
+NO_SEAT = 15  # Stands in for "X" (nobody) in the seat fields.
+
+
+# A pile of cards is stored as its length in the top 5 bits and one bit per card below that, 1 being Fascist. The
+# first card of the pile is the highest of the card bits.
+def packPolicies(policies):
+    if isinstance(policies, PolicyDeck):
+        return policies.bits()
+    bits = 0
+    for policy in policies:
+        bits = (bits << 1) | (policy.getId() == 2)
+    return (len(policies) << 17) | bits
+
+
+def unpackPolicies(bits):
+    return PolicyDeck(policyCode(bits))
+
+
+# The state code characters for a packed pile.
+def policyCode(bits):
+    length = bits >> 17
+    if length == 0:
+        return ""
+    return format(bits & 0x1FFFF, "0" + str(length) + "b").translate(BIT_TO_CODE)
+
+
+def packSeat(seat):
+    if seat is None or seat == "X":
+        return NO_SEAT
+    return int(seat)
+
+
+# Splits a key back into a dictionary of its fields. Seats that are empty come back as "X" like readString does.
+def unpackKey(key):
+    fields = {}
+    for name, width in reversed(KEY_FIELDS):
+        fields[name] = key & ((1 << width) - 1)
+        key >>= width
+    for name in ("president", "chancellor", "termLimited"):
+        if fields[name] == NO_SEAT:
+            fields[name] = "X"
+    return fields
+
+
+def keyToBytes(key):
+    return key.to_bytes(KEY_BYTES, "big")
+
+
+def bytesToKey(data):
+    return int.from_bytes(data, "big")
+
+
+# Converts a state code into a key without needing a GameState to do it.
+def stringToKey(string):
+    splitstring = string.split("/")
+    polNum = splitstring[1].split(".")
+
+    fasMask = 0
+    for x in splitstring[3].split("-"):
+        if x != "":
+            fasMask |= 1 << int(x)
+    rolesApplied = splitstring[2] != "" or splitstring[3] != ""
+
+    key = int(splitstring[0])
+    key = (key << 5) | int(polNum[0])
+    key = (key << 5) | int(polNum[1])
+    key = (key << 1) | rolesApplied
+    key = (key << 10) | fasMask
+    for pile in (splitstring[4], splitstring[5]):
+        bits = 0
+        for x in pile:
+            bits = (bits << 1) | (x != str(1))
+        key = (key << 22) | (len(pile) << 17) | bits
+    key = (key << 3) | int(splitstring[6])
+    key = (key << 3) | int(splitstring[7])
+    for x in splitstring[8:11]:
+        key = (key << 4) | packSeat(x)
+
+    return key
+
+
+# Converts a key back into the exact state code that createString would have produced for it.
+def keyToString(key):
+    fields = unpackKey(key)
+
+    code = str(fields["players"]) + "/" + str(fields["libPol"]) + "." + str(fields["fasPol"]) + "/"
+    lib = ""
+    fas = ""
+    if fields["rolesApplied"]:
+        for x in range(0, fields["players"]):
+            if fields["fasMask"] & (1 << x):
+                fas = fas + str(x) + "-"
+            else:
+                lib = lib + str(x) + "-"
+    code = code + lib + "/" + fas + "/"
+    code = code + policyCode(fields["deck"]) + "/"
+    code = code + policyCode(fields["discardDeck"]) + "/"
+    code = code + str(fields["playedLib"]) + "/" + str(fields["playedFas"]) + "/"
+    code = code + str(fields["president"]) + "/" + str(fields["chancellor"]) + "/" + str(fields["termLimited"])
+
+    return code
+
+
+"""
+The Outcome Cache remembers the possible futures worked out for a state so they don't have to be generated again when
+the same state comes round again, in a later turn or another game. Keys are built from state keys and plain values so
+nothing in the cache points back into a game, which makes it safe for every board in a process to share one. It holds
+at most maxsize entries and drops the least recently used when full. A cache can be saved at the end of a run and
+loaded to warm up the next one.
+
+Keys include the order of the deck, so fresh random games rarely meet the same state twice and the shared cache is
+off (maxsize 0) unless asked for. It pays off when the same positions are played out again and again, such as
+searching from one position or replaying seeded games.
+"""
+
+
+class OutcomeCache(object):
+
+    __slots__ = ("maxsize", "entries", "hits", "misses")
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    # Returns the cached value or None.
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.entries[key] = value
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    # Changes maxsize, dropping the least recently used entries which no longer fit.
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        while self.entries and len(self.entries) > max(maxsize, 0):
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def getStats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self.entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "hitRate": self.hits / lookups if lookups else 0.0}
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(list(self.entries.items()), f)
+
+    # Adds the entries saved by a previous run, keeping within maxsize.
+    def load(self, path):
+        with open(path, "rb") as f:
+            for key, value in pickle.load(f):
+                self.put(key, value)
+
+
+OUTCOMES = OutcomeCache(0)
 
 
 """
@@ -404,6 +946,8 @@ This is achieved by randomly shuffling every possible code and then taking the f
 
 class RandomPlayer(Player):
 
+    __slots__ = ()
+
     def __init__(self, name, role, GB):
         super().__init__(name, role, GB) # Inherits the Player object as we still need their functions
 
@@ -428,7 +972,7 @@ class RandomPlayer(Player):
 
     # Select a Random State Code from list of possible.
     def selectOutcome(self, PSC):
-        random.shuffle(PSC)
+        self.GB.rng.shuffle(PSC)
         chosenGameState = PSC[0]
         return chosenGameState
 
@@ -448,6 +992,8 @@ Code which does.
 
 class RolePlayer(Player):
 
+    __slots__ = ()
+
     def __init__(self, name, role, GB):
         super().__init__(name, role, GB)
 
@@ -468,33 +1014,13 @@ class RolePlayer(Player):
         hand = self.drawCards()
         PSC = self.generatePSCHand(hand)
 
-        actions = []
-
         # Define the Goal
         if self.role == "Liberal":
             goal = "l+1"
         else:
             goal = "f+1"
 
-        # Define the Current Played Cards to compare possible futures to
-        currentlib = self.GB.state.playedLib
-        currentfas = self.GB.state.playedFas
-
-        for x in PSC:
-            splitstring = x.split("/")
-            lib = splitstring[6]
-            fas = splitstring[7]
-            if int(lib) - currentlib == 1:
-                actions.append("l+1")  # Create a list of actions and which goal each one fulfils.
-            elif int(fas) - currentfas == 1:
-                actions.append("f+1")
-
-        count = 0
-        outcome = None
-        for x in actions:
-            if x == goal:
-                outcome = PSC[count]  # Selects as outcome the Action which Meets the goal
-            count += 1
+        outcome = self.goalOutcome(PSC, goal)  # Selects as outcome the Action which Meets the goal
 
         if outcome is None:
             outcome = self.selectOutcome(PSC)  # Can't find one? Random Select..
@@ -503,7 +1029,7 @@ class RolePlayer(Player):
 
     # Still need a random selector in cases where it is not possible to fulfil the role.
     def selectOutcome(self, PSC):
-        random.shuffle(PSC)
+        self.GB.rng.shuffle(PSC)
         chosenGameState = PSC[0]
         return chosenGameState
 
@@ -520,15 +1046,27 @@ To achieve this we adapt the last player but every time an action is take by ANO
 a "Bad" Action. Sus is increased on that player. If it is a good action the it is reduced, but by a smaller amount as
 bad actions are much worse than good actions. This would be an interesting parameter to change however. 
 
+The amounts, the floor sus can't go below and who each side elects are class attributes, setSusParams changes them for
+every Intelligent Player (see sweep.py for searching over them).
+
+Every player's sus is kept together in the board's sus matrix (susmatrix.py), with a row for each player. susDict gives
+a player's row as a dictionary of the other players.
+
 """
 
 
 class IntelligentRolePlayer(Player):
 
+    __slots__ = ()
+
+    libWeight = -2  # Added to the chancellor's sus when they play a Liberal policy
+    fasWeight = 5  # Added to the chancellor's sus when they play a Fascist policy
+    susFloor = 0  # Sus never goes below this, None for no floor
+    libElect = "min"  # Liberals elect the least sus player, "max" for the most
+    fasElect = "max"  # Fascists elect the most sus player, "min" for the least
+
     def __init__(self, name, role, GB):
         super().__init__(name, role, GB)
-        self.susDict = {}  # This requires a dictionary of players and the value of sus that we have on all of them
-        self.otherPlayers = None
 
     # Used to check in console the type of player.
     def areRole(self):
@@ -536,45 +1074,35 @@ class IntelligentRolePlayer(Player):
 
     # Populate the initial values of sus
     def populate(self):
-        self.otherPlayers = dict(self.GB.state.playerDict)  # Fill other players with all players
-        for x in self.otherPlayers:
-            if str(x) == str(self.name):
-                del self.otherPlayers[x]  # Remove self. Can't have sus on self as you know your own role.
-                break
-
-        for x in self.otherPlayers:
-            self.susDict[x] = 0
-
-    # Elect with regards to sus values
+        self.GB.sus.reset(self.getId())
+
+    # Every player but this one, as sus can't be held on yourself as you know your own role.
+    @property
+    def otherPlayers(self):
+        players = self.GB.state.playerDict
+        del players[self]
+        return players
+
+    # This player's sus of every other player, read from the board's sus matrix.
+    @property
+    def susDict(self):
+        row = self.GB.sus.row(self.getId())
+        return dict((x, row[id]) for x, id in self.otherPlayers.items())
+
+    # Elect with regards to sus values. The term limited player can't be elected.
     def elect(self, candidateList):
-        # del candidateList[self]
-
-        PSC = self.generatePSCElection(candidateList)
-
-        outcome = None
-
-        print(self.role)
-        if self.role == "Liberal":  # Different depending on the role you are. Liberals always elect LEAST sus
-            key = min(self.susDict, key=self.susDict.get)
-            id = self.GB.state.playerDict.get(key)
-            for x in PSC:
-                splitcode = x.split("/")
-                if int(id) == int(splitcode[9]):
-                    outcome = x
+        if self.role == "Liberal":  # Different depending on the role you are. By default Liberals elect LEAST sus
+            rule = self.libElect
         else:
-            key = max(self.susDict, key=self.susDict.get)  # Fascists always elect the MOST sus
-            id = self.GB.state.playerDict.get(key)
-            for x in PSC:
-                splitcode = x.split("/")
-                if int(id) == int(splitcode[9]):
-                    outcome = x
-
-        # outcome = self.selectOutcome(PSC)
-        self.GB.state.readString(outcome)
+            rule = self.fasElect  # and Fascists elect the MOST sus
+        termLimited = self.GB.state.termLimited
+        if not isinstance(termLimited, int):
+            termLimited = None
+        self.GB.state.chancellor = self.GB.sus.pick(self.getId(), rule == "min", termLimited)
 
     # Leftover function. Don't think I need. Scared to delete.
     def selectOutcome(self, PSC):
-        random.shuffle(PSC)
+        self.GB.rng.shuffle(PSC)
         chosenGameState = PSC[0]
         return chosenGameState
 
@@ -583,64 +1111,374 @@ class IntelligentRolePlayer(Player):
         hand = self.drawCards()
         PSC = self.generatePSCHand(hand)
 
-        actions = []
-
         if self.role == "Liberal":
             goal = "l+1"
         else:
             goal = "f+1"
 
-        currentlib = self.GB.state.playedLib
-        currentfas = self.GB.state.playedFas
-
-        for x in PSC:
-            splitstring = x.split("/")
-            lib = splitstring[6]
-            fas = splitstring[7]
-            if int(lib) - currentlib == 1:
-                actions.append("l+1")
-            elif int(fas) - currentfas == 1:
-                actions.append("f+1")
-
-        count = 0
-        outcome = None
-        for x in actions:
-            if x == goal:
-                outcome = PSC[count]
-            count += 1
+        outcome = self.goalOutcome(PSC, goal)
 
         if outcome is None:
             outcome = self.selectOutcome(PSC)
 
         self.GB.state.readString(outcome)
 
-    # When an action is broadcasted every player will use this function to adjust their sus values.
+    # Adjusts this player's sus of the chancellor alone. Broadcasts update every player at once with updateAllSus.
     def updateSus(self, chancellor, played):
-
         if played == 1:
-            self.susDict[chancellor] -= 2
-            if self.susDict[chancellor] < 0:
-                self.susDict[chancellor] = 0
-        elif played == 2:
-            self.susDict[chancellor] += 5  # These could be interesting to change?
+            value = self.GB.sus.values[self.getId(), chancellor.getId()] + self.libWeight
+        else:
+            value = self.GB.sus.values[self.getId(), chancellor.getId()] + self.fasWeight
+        if self.susFloor is not None and value < self.susFloor:
+            value = self.susFloor
+        self.GB.sus.values[self.getId(), chancellor.getId()] = value
+
+    # When an action is broadcasted every player other than the chancellor adjusts their sus of the chancellor.
+    @classmethod
+    def updateAllSus(cls, GB, chancellor, played):
+        GB.sus.update(chancellor.getId(), played, cls.libWeight, cls.fasWeight, cls.susFloor)
 
     def __str__(self):
         return str(self.name)
 
 
+SUS_PARAMS = {"libWeight": -2, "fasWeight": 5, "susFloor": 0, "libElect": "min", "fasElect": "max"}
+
+
+# Sets the sus parameters of every Intelligent Player, anything not given goes back to its default. Returns the
+# parameters in use.
+def setSusParams(params=None):
+    params = dict(SUS_PARAMS, **(params or {}))
+    for name in SUS_PARAMS:
+        setattr(IntelligentRolePlayer, name, params[name])
+    return params
+
+
+# The sus parameters Intelligent Players are using now, to put back with setSusParams later.
+def getSusParams():
+    return dict((name, getattr(IntelligentRolePlayer, name)) for name in SUS_PARAMS)
+
+
+"""
+Bayesian Players replace the sus of Intelligent Players with an exact posterior over every way the roles could have
+been dealt (see belief.py), kept on the board for every player at once and updated with each broadcast. Elections go
+by the chance of each player being on the Fascist side: Liberals elect the least likely, Fascists (who know the roles)
+the most likely, which is one of their own.
+
+libPlaysLib and fasPlaysLib are the likelihood model, how often each side's chancellors are thought to play a Liberal
+policy. The defaults are what Role Players were measured doing, at every table size.
+"""
+
+
+class BayesianRolePlayer(RolePlayer):
+
+    __slots__ = ()
+
+    libPlaysLib = 0.58  # P(a Liberal chancellor plays a Liberal policy)
+    fasPlaysLib = 0.11  # P(a Fascist side chancellor plays a Liberal policy)
+
+    def __init__(self, name, role, GB):
+        super().__init__(name, role, GB)
+
+    # Used to check in console the type of player.
+    def areRole(self):
+        return self.name + " is a Bayesian Role Actor"
+
+    # This player's P(fascist side) of every other player, read from the board's belief.
+    @property
+    def fascistDict(self):
+        row = self.GB.belief.fascist(self.getId())
+        return dict((x, row[x.getId()]) for x in self.GB.state.roster if x is not self)
+
+    # Elect by the posterior. The term limited player can't be elected.
+    def elect(self, candidateList):
+        termLimited = self.GB.state.termLimited
+        if not isinstance(termLimited, int):
+            termLimited = None
+        self.GB.state.chancellor = self.GB.belief.pick(self.getId(), self.role == "Liberal", termLimited)
+
+    def __str__(self):
+        return str(self.name)
+
+
+"""
+MCTS Players search for their moves with Monte Carlo Tree Search rather than following a fixed rule. The tree is over
+public information only: a node is the position as every player sees it, the policies played, the size of the discard
+pile, the president and the chancellor (None while the president is still choosing), see publicKey. The deck order
+and the roles are not in it, so the same node is reached whatever they turn out to be. The outcomes of the decision
+being made (from generatePSCElection, or every card of the hand that generatePSCHand picks from) are the children of
+the root.
+
+Each playout fills the hidden information in afresh: the deck is shuffled, as nobody can see its order, and the roles
+the player can't see are dealt again around what they know. That is their own role, and the whole Fascist side when
+their role shows it to them. The playout then goes down the tree. At the player's own decisions the child is picked
+by UCB1 and everybody else acts like the opponent model, Role or Random players. The first node which isn't in the tree
+yet is added and the game is played out from there with everybody, the MCTS player included, acting like the opponent
+model. Every node on the way down counts a visit, and a win if the player's own side won.
+
+Playouts don't use GameState objects, the outcome's state code is read once into plain lists and numbers and every
+playout works on a copy of those.
+
+The search stops after iterations playouts or timeBudget seconds, whichever comes first, and the most visited outcome
+is taken. With reuseTree the tree is kept between moves. By the player's next decision the game has gone down one of
+the branches the last search looked at, so the node it has reached starts with what was learnt then. Nodes with fewer
+policies played than the position now can't come up again and are dropped.
+"""
+
+
+class MCTSPlayer(Player):
+
+    __slots__ = ("tree", "playouts")
+
+    iterations = 1000
+    timeBudget = None  # Seconds per decision, None for no limit
+    exploration = 1.4
+    opponent = "Role"  # Or "Random"
+    reuseTree = False
+
+    def __init__(self, name, role, GB):
+        super().__init__(name, role, GB)
+        self.tree = {}  # Public key of a node: [visits, wins]
+        self.playouts = 0  # Over every decision, for measuring speed
+
+    # Used to check in console the type of player.
+    def areMCTS(self):
+        return self.name + " is a MCTS Actor"
+
+    # President Function
+    def elect(self, candidateList):
+        PSC = self.generatePSCElection(candidateList)
+        outcome = self.search(PSC, True)
+        self.GB.state.readString(outcome)
+
+    # Chancellor Function
+    def drawAndChoose(self):
+        hand = self.drawCards()
+        outcome = self.search(self.handOutcomes(hand), False)
+        self.GB.state.readString(outcome)
+
+    # Runs the search over the outcomes and returns the most visited. elected says whether the outcomes are elections,
+    # in which case the chancellor still has to play a card before the next president.
+    def search(self, PSC, elected):
+        outcomes = list(dict.fromkeys(PSC))  # Duplicates are the same outcome
+        if len(outcomes) == 1:
+            return outcomes[0]
+
+        state = self.GB.state
+        played = state.playedLib + state.playedFas
+        if not self.reuseTree:
+            self.tree = {}
+        elif self.tree:
+            self.tree = dict((key, stats) for key, stats in self.tree.items() if key[0] + key[1] >= played)
+        tree = self.tree
+
+        rng = self.GB.rng
+        seats = self.GB.seats
+        me = self.getId()
+        isRole = self.opponent == "Role"
+        fasSeats = None
+        if self.role == "Fascist" or (self.role == "Hitler" and state.players <= 6):  # As belief.knowsRoles
+            fasSeats = set(state.fasIds)
+        others = [x for x in seats if x != me]
+        fasOthers = len(state.fasIds) - (self.role != "Liberal")
+        chancellor = state.chancellor if isinstance(state.chancellor, int) else None
+        root = (state.playedLib, state.playedFas, len(state.discardDeck), state.president, chancellor)
+        starts = [readPlayout(x) for x in outcomes]
+        children = [publicKey(x, elected, seats) for x in starts]
+        tree.setdefault(root, [0, 0])
+        for key in children:
+            tree.setdefault(key, [0, 0])
+
+        deadline = None
+        if self.timeBudget is not None:
+            deadline = time.perf_counter() + self.timeBudget
+
+        for iteration in range(0, self.iterations):
+            if deadline is not None and iteration % 32 == 0 and time.perf_counter() > deadline:
+                break
+            best = children.index(choose(tree, root, children, self.exploration))
+
+            # Deal the hidden roles again for this playout
+            deal = fasSeats
+            if deal is None:
+                deal = set(rng.sample(others, fasOthers))
+                if self.role != "Liberal":
+                    deal.add(me)
+
+            path = [root, children[best]]
+            libWin = playout(starts[best], seats, deal, elected, isRole, rng, tree=tree, me=me, path=path,
+                             exploration=self.exploration)
+            won = libWin == (self.role == "Liberal")
+            for key in path:
+                stats = tree[key]
+                stats[0] += 1
+                stats[1] += won
+            self.playouts += 1
+
+        best = max(range(0, len(children)), key=lambda x: tree[children[x]][0])
+        return outcomes[best]
+
+    def __str__(self):
+        return str(self.name)
+
+
+# Reads the parts of a state code a playout needs: the deck, discard pile make up, played cards, president and
+# chancellor.
+def readPlayout(code):
+    splitstring = code.split("/")
+    deck = [int(x) for x in splitstring[4]]
+    discardLib = splitstring[5].count("1")
+    discardFas = len(splitstring[5]) - discardLib
+    chancellor = int(splitstring[9]) if splitstring[9] != "X" else None
+    return deck, discardLib, discardFas, int(splitstring[6]), int(splitstring[7]), int(splitstring[8]), chancellor
+
+
+# The tree node of a playout state: (played Liberal, played Fascist, discard pile size, president, chancellor). A
+# state where the card has been played (elected not set) is the next president's election.
+def publicKey(start, elected, seats):
+    deck, discardLib, discardFas, playedLib, playedFas, president, chancellor = start
+    if elected:
+        return playedLib, playedFas, discardLib + discardFas, president, chancellor
+    president = seats[(seats.index(president) + 1) % len(seats)]
+    return playedLib, playedFas, discardLib + discardFas, president, None
+
+
+# The child of parent with the best UCB1 score, any child not visited yet first.
+def choose(tree, parent, keys, exploration):
+    logTotal = math.log(tree[parent][0] + 1)
+    best = None
+    bestScore = -1.0
+    for key in keys:
+        stats = tree.get(key)
+        if stats is None or stats[0] == 0:
+            return key
+        visits, wins = stats
+        score = wins / visits + exploration * math.sqrt(logTotal / visits)
+        if score > bestScore:
+            best = key
+            bestScore = score
+    return best
+
+
+# Plays a game out to the end from a playout state, returning True for a Liberal win. When elected is set the
+# chancellor of the starting state still has to play a card, otherwise the next president is up. isRole picks between
+# Role and Random players, elections are always random.
+#
+# Given a tree the playout goes down it from the last node of path, adding every node it passes to path. Player me
+# picks their moves with choose while it is in the tree. The first node that isn't in the tree is added to it and the
+# rest of the game is played without it.
+def playout(start, seats, fasSeats, elected, isRole, rng, wincon=5, tree=None, me=None, path=None, exploration=1.4):
+    deck, discardLib, discardFas, playedLib, playedFas, president, chancellor = start
+    deck = list(deck)
+    rng.shuffle(deck)
+    n = len(seats)
+    seat = seats.index(president)
+    inTree = tree is not None and path[-1] in tree and tree[path[-1]][0] > 0
+
+    if not elected:
+        seat = (seat + 1) % n
+    while playedLib < wincon and playedFas < wincon:
+        if not elected:
+            president = seats[seat]
+            if inTree and president == me:
+                discard = discardLib + discardFas
+                chancellor = choose(tree, path[-1], [(playedLib, playedFas, discard, me, x) for x in seats if x != me],
+                                    exploration)[4]
+            else:
+                chancellor = seats[(seat + rng.randrange(1, n)) % n]
+            if inTree:
+                key = (playedLib, playedFas, discardLib + discardFas, president, chancellor)
+                path.append(key)
+                if key not in tree:
+                    tree[key] = [0, 0]
+                    inTree = False
+        elected = False
+
+        if len(deck) < 3:  # Reshuffle
+            deck = deck + [1] * discardLib + [2] * discardFas
+            rng.shuffle(deck)
+            discardLib = 0
+            discardFas = 0
+        hand = deck[-3:]
+        del deck[-3:]
+
+        if inTree and chancellor == me and 1 in hand and 2 in hand:
+            discard = discardLib + discardFas + 2
+            following = seats[(seat + 1) % n]
+            keys = [(playedLib + 1, playedFas, discard, following, None),
+                    (playedLib, playedFas + 1, discard, following, None)]
+            played = 1 if choose(tree, path[-1], keys, exploration) is keys[0] else 2
+        elif isRole:
+            goal = 2 if chancellor in fasSeats else 1
+            # Three random candidates like generatePSCHand, the goal is played if any of them are it
+            if hand[rng.randrange(3)] == goal or hand[rng.randrange(3)] == goal or hand[rng.randrange(3)] == goal:
+                played = goal
+            else:
+                played = 3 - goal
+        else:
+            played = hand[rng.randrange(3)]
+
+        hand.remove(played)
+        for x in hand:
+            if x == 1:
+                discardLib += 1
+            else:
+                discardFas += 1
+        if played == 1:
+            playedLib += 1
+        else:
+            playedFas += 1
+        seat = (seat + 1) % n
+        if inTree:
+            key = (playedLib, playedFas, discardLib + discardFas, seats[seat], None)
+            path.append(key)
+            if key not in tree:
+                tree[key] = [0, 0]
+                inTree = False
+
+    return playedLib >= wincon
+
+
+# Every type of player by name, for giving each player at a table their own.
+HEURISTICS = {"Random": RandomPlayer, "Role": RolePlayer, "Intelligent": IntelligentRolePlayer, "MCTS": MCTSPlayer,
+              "Bayesian": BayesianRolePlayer}
+
+
+# The name in HEURISTICS of a player's type, None for a plain Player.
+def heuristicName(player):
+    for name, kind in HEURISTICS.items():
+        if type(player) is kind:
+            return name
+    return None
+
+
 """
 Game Player is a class which takes all of the above and runs games based on them. Like an organiser. This is where all 
 of my parameters will feed into and all of the programs outputs come out to.
+
+With a stopping rule (see stopping.py) games are played in batches until the rule is met, with games being the most
+that will be played (None for no limit). stopResult then has the games used and the Liberal win rate interval.
+
+stats is told about every policy and every finished game, to keep more than the win counts (see accumulators.py).
 """
 
 
 class GamePlayer(object):
 
-    def __init__(self, players, isRandom, isRole, isIntelligent):
+    __slots__ = ("players", "isRandom", "isRole", "isIntelligent", "isMCTS", "isBayesian", "heuristics", "GB", "round",
+                 "subround", "seats", "seatPointer", "president", "chancellor", "wincon", "libWinCount", "fasWinCount",
+                 "gameCount", "roundCount", "reshuffleCount", "log", "rng", "gameSeed", "stopResult", "lastPlayed",
+                 "stats")
+
+    def __init__(self, players, isRandom, isRole, isIntelligent, games=100, log=None, seed=None, isMCTS=False,
+                 stop=None, batch=100, heuristics=None, isBayesian=False, stats=None):
         self.players = players
         self.isRandom = isRandom
         self.isRole = isRole
         self.isIntelligent = isIntelligent
+        self.isMCTS = isMCTS
+        self.isBayesian = isBayesian
+        self.heuristics = heuristics  # A heuristic name for each player to mix types at one table, see GameBoard
         self.GB = None
         self.round = 0
         self.subround = 0
@@ -651,10 +1489,28 @@ class GamePlayer(object):
         self.wincon = 5
         self.libWinCount = 0
         self.fasWinCount = 0
-
-        for x in range(0, 100):
-            self.game()
-            self.reset()
+        self.gameCount = 0
+        self.roundCount = 0  # Totals over every game played, divide by gameCount for the averages
+        self.reshuffleCount = 0
+        self.log = log if log is not None else gamelog.GameLog([gamelog.ConsoleSink()])
+        self.rng = random.Random(seed) if seed is not None else None  # Hands out a seed for each game
+        self.gameSeed = None  # Seed of the game being played, replay.py can play it again from this
+        self.stopResult = None
+        self.stats = stats  # Accumulators told about every policy and game, see accumulators.GameStats
+
+        if stop is None:
+            for x in range(0, games):
+                self.game()
+                self.reset()
+        else:
+            while games is None or self.gameCount < games:
+                size = batch if games is None else min(batch, games - self.gameCount)
+                for x in range(0, size):
+                    self.game()
+                    self.reset()
+                if stop.done(self.libWinCount, self.gameCount):
+                    break
+            self.stopResult = stop.result(self.libWinCount, self.gameCount)
 
     # Since we are running multiple games then we will need to totally reset everything when playing a new game
     def reset(self):
@@ -668,24 +1524,24 @@ class GamePlayer(object):
 
     # Runs a copy of the game. Round one if slightly different and should ALWAYS happen.
     # Future rounds happen if win condition not met.
-    def game(self):
+    #
+    # Every game of a seeded GamePlayer gets its own seed, which can also be given to play one particular game again.
+    def game(self, gameSeed=None):
+        self.setupGame(gameSeed)
+
         # Round One
-        self.GB = GameBoard(self.players, self.isRandom, self.isRole, self.isIntelligent)
-        if self.isIntelligent:
-            for x in self.GB.state.playerDict:
-                x.populate()
-        self.defineOrderInit()
-        self.president = self.callIdDict(self.GB.state.president)
+        self.roundStart()
         self.statusUpdate()
 
         self.elect()
 
         self.statusUpdate()
 
-        self.lastStateCode = self.GB.state.createString()
+        self.markState()
         self.chancellor.drawAndChoose()
-        if self.isIntelligent:
-            self.broadcast() # Broadcasting for Intelligent Player Games
+        if self.GB.listening:
+            self.broadcast() # Broadcasting for Intelligent and Bayesian Player Games
+        self.enacted()
 
         self.statusUpdate()
 
@@ -694,34 +1550,70 @@ class GamePlayer(object):
 
         while self.GB.state.playedLib < self.wincon and self.GB.state.playedFas < self.wincon: # Keep playing until Win
             # Condition is met.
+            self.roundStart()
             self.statusUpdate()
             self.elect()
             self.statusUpdate()
-            self.lastStateCode = self.GB.state.createString()
+            self.markState()
             self.chancellor.drawAndChoose()   # Chancellor Chooses Cards.
-            if self.isIntelligent:
+            if self.GB.listening:
                 self.broadcast()
+            self.enacted()
             self.statusUpdate()
             self.newPres()
 
-        # End of Game output.
-        print("Liberal Policy Played = " + str(self.GB.state.playedLib))
-        print("Fascist Policy Played = " + str(self.GB.state.playedFas))
+        self.endGame()
+
+    # Deals the roles, seats the players and shuffles the deck for a new game.
+    def setupGame(self, gameSeed=None):
+        if gameSeed is None and self.rng is not None:
+            gameSeed = self.rng.getrandbits(64)
+        self.gameSeed = gameSeed
+        rng = random.Random(gameSeed) if gameSeed is not None else None
+
+        self.GB = GameBoard(self.players, self.isRandom, self.isRole, self.isIntelligent, self.log, rng,
+                            isMCTS=self.isMCTS, heuristics=self.heuristics, isBayesian=self.isBayesian)
+        self.GB.gameNumber = self.gameCount
+        if self.GB.sus is not None:  # Any Intelligent Players
+            for x in self.GB.state.playerDict:
+                if isinstance(x, IntelligentRolePlayer):
+                    x.populate()
+        self.defineOrderInit()
+        self.gameStart()
+        self.president = self.callIdDict(self.GB.state.president)
+
+    def gameOver(self):
+        return self.GB.state.playedLib >= self.wincon or self.GB.state.playedFas >= self.wincon
+
+    # End of Game output.
+    def endGame(self):
         if self.GB.state.playedLib > self.GB.state.playedFas:
-            print("Lib Win")
+            winner = "Liberal"
             self.libWinCount += 1
         else:
-            print("Fas Win")
+            winner = "Fascist"
             self.fasWinCount += 1
-
-        if self.isIntelligent:
+        if self.log.enabled(gamelog.RESULT):
+            self.GB.emit(gamelog.GAME_END, gamelog.RESULT, winner=winner, playedLib=self.GB.state.playedLib,
+                         playedFas=self.GB.state.playedFas, rounds=self.round, reshuffles=self.GB.reshuffles)
+        self.gameCount += 1
+        self.roundCount += self.round
+        self.reshuffleCount += self.GB.reshuffles
+        if self.stats is not None:
+            self.stats.endGame(self)
+
+        if self.GB.sus is not None and self.log.enabled(gamelog.DEBUG):
             for x in self.GB.state.playerDict:
-                print(x.susDict)
+                if not isinstance(x, IntelligentRolePlayer):
+                    continue
+                self.GB.emit(gamelog.SUSPICION, gamelog.DEBUG, player=str(x),
+                             sus=dict((str(y), x.susDict[y]) for y in x.susDict))
 
     # Initial function for defining a seating arrangement of players. President rotates.
     def defineOrderInit(self):
         self.seats = list(self.GB.state.playerDict)
-        random.shuffle(self.seats)
+        self.GB.rng.shuffle(self.seats)
+        self.GB.seats = [self.callPlayerDict(x) for x in self.seats]
         self.GB.state.president = self.callPlayerDict(self.seats[self.seatPointer])
 
     # Shift over the president to next Player.
@@ -734,43 +1626,70 @@ class GamePlayer(object):
         self.GB.state.chancellor = "X"
         self.subround = 0
         self.round += 1
+        self.GB.round = self.round
 
     # President Chooses to Elect Player which activates player object functions
     def elect(self):
         self.president = self.callIdDict(self.GB.state.president)
         candidateList = self.GB.state.playerDict
         self.president.elect(candidateList)
-        self.chancellor = self.callIdDict(self.GB.state.chancellor)
+        self.elected()
 
-    # Broadcasts actions to appropriate players so they can update their internal sus values.
+    # Once the president has chosen, whether in elect or from outside (see asynchost.py).
+    def elected(self):
+        self.chancellor = self.callIdDict(self.GB.state.chancellor)
+        if self.log.enabled(gamelog.DEBUG):
+            self.GB.emit(gamelog.ELECTION, gamelog.DEBUG, president=str(self.president), role=self.president.role,
+                         chancellor=str(self.chancellor))
+
+    # Logging around the round, kept out of the game loop itself
+    def gameStart(self):
+        if self.log.enabled(gamelog.INFO):
+            self.GB.emit(gamelog.GAME_START, gamelog.INFO, seed=self.gameSeed,
+                         seats=[self.callPlayerDict(x) for x in self.seats],
+                         roles=[self.callIdDict(x).role for x in range(0, len(self.seats))],
+                         heuristics=[heuristicName(self.callIdDict(x)) for x in range(0, len(self.seats))],
+                         deck=self.GB.state.deck.code())
+
+    def roundStart(self):
+        if self.log.enabled(gamelog.INFO):
+            self.GB.emit(gamelog.ROUND_START, gamelog.INFO, president=str(self.president))
+
+    def enacted(self):
+        if self.log.enabled(gamelog.INFO):
+            if self.GB.state.playedLib > self.lastPlayed[0]:
+                policy = "Liberal"
+            else:
+                policy = "Fascist"
+            self.GB.emit(gamelog.POLICY_ENACTED, gamelog.INFO, chancellor=str(self.chancellor), policy=policy,
+                         playedLib=self.GB.state.playedLib, playedFas=self.GB.state.playedFas)
+        if self.stats is not None:
+            self.stats.enacted(self)
+
+    # Remembers the state before the chancellor plays, so enacted and broadcast can see what they played.
+    def markState(self):
+        state = self.GB.state
+        self.lastPlayed = (state.playedLib, state.playedFas)
+
+    # Broadcasts actions to appropriate players so they can update their internal sus values and beliefs.
     def broadcast(self):
-        last = self.lastStateCode.split("/")
-        lastLib = last[6]
-        lastFas = last[7]
-
-        currentStateCode = self.GB.state.createString
-        current = currentStateCode().split("/")
-        currentLib = current[6]
-        currentFas = current[7]
-
-        if int(currentLib) - int(lastLib) == 1:
+        if self.GB.state.playedLib > self.lastPlayed[0]:
             played = 1
-        elif int(currentFas) - int(lastFas) == 1:
+        else:
             played = 2
-
-        broadCastDict = dict(self.GB.state.playerDict)
-        broadCastDict.pop(self.chancellor)
-        for x in broadCastDict:
-            x.updateSus(self.chancellor, played)
+        if self.GB.sus is not None:
+            IntelligentRolePlayer.updateAllSus(self.GB, self.chancellor, played)
+        if self.GB.belief is not None:
+            self.GB.belief.update(self.chancellor.getId(), played)
 
     # Frequent Call Functions
     def callPlayerDict(self, p):
-        return self.GB.state.playerDict.get(p)
+        return p.getId() if p in self.GB.state.roster else None
 
     def callIdDict(self, id):
-        return self.GB.state.IdDict.get(id)
+        return self.GB.state.player(id)
 
-    # Frequent Print Statements. Output to Console
+    # Frequent Print Statements. Sent to the log as status events
     def currentStateCode(self):
         return "Current State: " + self.GB.state.createString()
 
@@ -780,14 +1699,12 @@ class GamePlayer(object):
 
     def statusUpdate(self):
 
-        print("Round: " + str(self.round) + " | SubRound: " + str(self.subround))
+        if self.log.enabled(gamelog.DEBUG):
+            self.GB.emit(gamelog.STATUS, gamelog.DEBUG, subround=self.subround,
+                         president=str(self.callIdDict(self.GB.state.president)),
+                         chancellor=str(self.callIdDict(self.GB.state.chancellor)))
         self.subround += 1
 
-        print(self.currentStateCode())
-        print(self.currentLeadership())
-
-        print("---------------------------")
-
     def getWinStats(self):
 
         print("Liberal Win Count " + str(self.libWinCount))
@@ -0,0 +1,334 @@
+import math
+
+"""
+Accumulators keep statistics of any number of games in constant memory, without keeping a record of each game. Every
+one of them can be merged with another of its kind, in any grouping and order, so each worker of a Tournament fills
+its own and the totals are merged together at the end. toDict gives a compact JSON-able form to send between
+processes or save, fromDict makes the accumulator again.
+
+ - Counts          A count for each key.
+ - Welford         Count, mean, variance, smallest and largest of a value, by Welford's online algorithm.
+ - Histogram       Counts in fixed width bins between low and high, with everything outside counted at either end.
+ - QuantileSketch  Any quantile of a value to within a relative error of alpha, in log sized buckets (as DDSketch).
+
+GameStats puts these together for the games of a GamePlayer, which calls it after every policy and at the end of
+every game:
+
+    stats = GameStats()
+    sh.GamePlayer(names, False, False, True, 1000, gamelog.GameLog(), stats=stats)
+    stats.report()
+"""
+
+
+class Counts(object):
+
+    __slots__ = ("counts",)
+
+    def __init__(self):
+        self.counts = {}
+
+    def add(self, key, count=1):
+        self.counts[key] = self.counts.get(key, 0) + count
+
+    def get(self, key):
+        return self.counts.get(key, 0)
+
+    def total(self):
+        return sum(self.counts.values())
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.add(key, count)
+        return self
+
+    def toDict(self):
+        return dict(self.counts)
+
+    @classmethod
+    def fromDict(cls, data):
+        counts = cls()
+        counts.counts = dict(data)
+        return counts
+
+
+class Welford(object):
+
+    __slots__ = ("count", "mean", "m2", "low", "high")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared differences from the mean
+        self.low = None
+        self.high = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.low is None or value < self.low:
+            self.low = value
+        if self.high is None or value > self.high:
+            self.high = value
+
+    # Chan's parallel form of Welford's update.
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.low = other.low if self.low is None else min(self.low, other.low)
+        self.high = other.high if self.high is None else max(self.high, other.high)
+        return self
+
+    # Sample variance, 0 until there are two values.
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+    def toDict(self):
+        return [self.count, self.mean, self.m2, self.low, self.high]
+
+    @classmethod
+    def fromDict(cls, data):
+        welford = cls()
+        welford.count, welford.mean, welford.m2, welford.low, welford.high = data
+        return welford
+
+
+class Histogram(object):
+
+    __slots__ = ("low", "high", "counts", "under", "over")
+
+    def __init__(self, low, high, bins):
+        self.low = low
+        self.high = high
+        self.counts = [0] * bins
+        self.under = 0  # Values below low
+        self.over = 0  # Values at or above high
+
+    def add(self, value, count=1):
+        if value < self.low:
+            self.under += count
+        elif value >= self.high:
+            self.over += count
+        else:
+            self.counts[int((value - self.low) * len(self.counts) / (self.high - self.low))] += count
+
+    def merge(self, other):
+        if (other.low, other.high, len(other.counts)) != (self.low, self.high, len(self.counts)):
+            raise ValueError("histograms with different bins can't be merged")
+        self.counts = [x + y for x, y in zip(self.counts, other.counts)]
+        self.under += other.under
+        self.over += other.over
+        return self
+
+    def total(self):
+        return self.under + sum(self.counts) + self.over
+
+    # (low, high, count) of every bin.
+    def bins(self):
+        width = (self.high - self.low) / len(self.counts)
+        return [(self.low + x * width, self.low + (x + 1) * width, count) for x, count in enumerate(self.counts)]
+
+    def toDict(self):
+        return [self.low, self.high, self.under, self.over, self.counts]
+
+    @classmethod
+    def fromDict(cls, data):
+        low, high, under, over, counts = data
+        histogram = cls(low, high, len(counts))
+        histogram.under = under
+        histogram.over = over
+        histogram.counts = list(counts)
+        return histogram
+
+
+# Values go into buckets whose bounds grow by gamma = (1 + alpha) / (1 - alpha), so any value in a bucket is within
+# alpha (relative) of the bucket's middle. Only buckets with something in them are kept, which for game statistics is
+# a handful, and merging adds the buckets up exactly.
+class QuantileSketch(object):
+
+    __slots__ = ("alpha", "gamma", "logGamma", "positive", "negative", "zeros", "count")
+
+    def __init__(self, alpha=0.01):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.logGamma = math.log(self.gamma)
+        self.positive = {}  # Bucket index: count
+        self.negative = {}  # Of -value
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value, count=1):
+        self.count += count
+        if value > 0:
+            index = int(math.ceil(math.log(value) / self.logGamma))
+            self.positive[index] = self.positive.get(index, 0) + count
+        elif value < 0:
+            index = int(math.ceil(math.log(-value) / self.logGamma))
+            self.negative[index] = self.negative.get(index, 0) + count
+        else:
+            self.zeros += count
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("sketches with different accuracies can't be merged")
+        for store, others in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in others.items():
+                store[index] = store.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        return self
+
+    def value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    # The value below which a share q of the values fall, None when empty.
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self.value(index)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self.value(index)
+        return self.value(max(self.positive))
+
+    def toDict(self):
+        return [self.alpha, self.zeros, sorted(self.positive.items()), sorted(self.negative.items())]
+
+    @classmethod
+    def fromDict(cls, data):
+        alpha, zeros, positive, negative = data
+        sketch = cls(alpha)
+        sketch.zeros = zeros
+        sketch.positive = dict((int(x), y) for x, y in positive)
+        sketch.negative = dict((int(x), y) for x, y in negative)
+        sketch.count = zeros + sum(sketch.positive.values()) + sum(sketch.negative.values())
+        return sketch
+
+
+"""
+Game Stats are the accumulators kept for games:
+
+ - winners        Games won by each side.
+ - rounds         Game length, as a Welford, Histogram and QuantileSketch.
+ - reshuffles     Deck reshuffles in each game, as a Welford and Histogram.
+ - seatWins       Wins of the player in each seat, by seat number (0 the first president).
+ - roleGames      Player games of each role, and roleWins their wins.
+ - chancellors    Elections by the president's and chancellor's roles, "Liberal>Fascist" for a Liberal president
+                  electing a Fascist.
+ - susAccuracy    For games with Intelligent Players, the share of Liberal Intelligent Players whose most suspected
+                  player was on the Fascist side at the end of the game, a tie at the top counting the share of the
+                  tied players who were (see topShare). beliefAccuracy is the same for Bayesian Players and their
+                  most likely fascist.
+"""
+
+# The share of the holder's most suspected players (everybody tied at the top of their row but themselves) who are on
+# the Fascist side. Ties are split evenly rather than settled by the order the players would be picked in.
+def topShare(row, holder, fascists):
+    top = max(x for id, x in enumerate(row) if id != holder)
+    tied = [id for id, x in enumerate(row) if id != holder and x >= top - 1e-9]
+    return sum(1 for x in tied if x in fascists) / len(tied)
+
+
+ACCUMULATORS = {"Counts": Counts, "Welford": Welford, "Histogram": Histogram, "QuantileSketch": QuantileSketch}
+
+
+class GameStats(object):
+
+    FIELDS = [("winners", "Counts", ()), ("rounds", "Welford", ()), ("roundsHistogram", "Histogram", (0, 20, 20)),
+              ("roundsSketch", "QuantileSketch", ()), ("reshuffles", "Welford", ()),
+              ("reshufflesHistogram", "Histogram", (0, 10, 10)), ("seatWins", "Counts", ()),
+              ("roleGames", "Counts", ()), ("roleWins", "Counts", ()), ("chancellors", "Counts", ()),
+              ("susAccuracy", "Welford", ()), ("beliefAccuracy", "Welford", ())]
+
+    def __init__(self):
+        for name, kind, args in self.FIELDS:
+            setattr(self, name, ACCUMULATORS[kind](*args))
+
+    # After each policy is enacted.
+    def enacted(self, GP):
+        self.chancellors.add(GP.president.role + ">" + GP.chancellor.role)
+
+    # At the end of each game, before the board is reset.
+    def endGame(self, GP):
+        GB = GP.GB
+        state = GB.state
+        liberalWin = state.playedLib > state.playedFas
+        self.winners.add("Liberal" if liberalWin else "Fascist")
+        self.rounds.add(GP.round)
+        self.roundsHistogram.add(GP.round)
+        self.roundsSketch.add(GP.round)
+        self.reshuffles.add(GB.reshuffles)
+        self.reshufflesHistogram.add(GB.reshuffles)
+        for seat, id in enumerate(GB.seats):
+            player = state.roster[id]
+            won = (player.role == "Liberal") == liberalWin
+            self.roleGames.add(player.role)
+            if won:
+                self.seatWins.add(str(seat))
+                self.roleWins.add(player.role)
+
+        fascists = set(state.fasIds)
+        for accumulator, matrix, view in ((self.susAccuracy, GB.sus, "susDict"),
+                                          (self.beliefAccuracy, GB.belief, "fascistDict")):
+            if matrix is None:
+                continue
+            holders = [x.getId() for x in state.roster if x.role == "Liberal" and hasattr(x, view)]
+            if holders:
+                rows = [matrix.row(x) if matrix is GB.sus else matrix.fascist(x) for x in holders]
+                accumulator.add(sum(topShare(row, x, fascists) for row, x in zip(rows, holders)) / len(holders))
+
+    def merge(self, other):
+        for name, kind, args in self.FIELDS:
+            getattr(self, name).merge(getattr(other, name))
+        return self
+
+    def toDict(self):
+        return dict((name, getattr(self, name).toDict()) for name, kind, args in self.FIELDS)
+
+    @classmethod
+    def fromDict(cls, data):
+        stats = cls()
+        for name, kind, args in cls.FIELDS:
+            if name in data:
+                setattr(stats, name, ACCUMULATORS[kind].fromDict(data[name]))
+        return stats
+
+    def report(self):
+        games = self.winners.total()
+        print("Games " + str(games) + ", Liberal " + str(self.winners.get("Liberal")) + ", Fascist " +
+              str(self.winners.get("Fascist")))
+        if games == 0:
+            return
+        print("Rounds mean %.2f sd %.2f, median %.1f, 90%% %.1f, range %s to %s" % (
+            self.rounds.mean, self.rounds.std(), self.roundsSketch.quantile(0.5), self.roundsSketch.quantile(0.9),
+            self.rounds.low, self.rounds.high))
+        print("Reshuffles mean %.2f sd %.2f, most %s" % (self.reshuffles.mean, self.reshuffles.std(),
+                                                        self.reshuffles.high))
+        print("Win rate by seat " + " ".join("%s:%.3f" % (x, self.seatWins.get(x) / games)
+                                            for x in sorted(self.seatWins.counts, key=int)))
+        print("Win rate by role " + " ".join("%s:%.3f" % (x, self.roleWins.get(x) / self.roleGames.get(x))
+                                            for x in sorted(self.roleGames.counts)))
+        total = self.chancellors.total()
+        print("Elections " + " ".join("%s:%.3f" % (x, self.chancellors.get(x) / total)
+                                      for x in sorted(self.chancellors.counts)))
+        for name, accumulator in (("Suspicion", self.susAccuracy), ("Belief", self.beliefAccuracy)):
+            if accumulator.count:
+                print(name + " accuracy %.3f over %d games" % (accumulator.mean, accumulator.count))
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import random
+import sys
+
+import gamelog
+import SecretHitler as sh
+
+"""
+The Async Host plays many tables at once on one asyncio event loop. Each table is its own GamePlayer and GameBoard, and
+every elect and drawAndChoose decision is awaited from the agent sitting in that seat, so a table waiting on a slow
+agent doesn't hold any other table up and no thread is needed per game.
+
+Agents:
+
+ - HeuristicAgent  The Player the board made for the seat (Random, Role, Intelligent...) decides straight away. Used
+                   for every seat without another agent.
+ - PipeAgent       A separate program talking JSON lines over its stdin and stdout.
+ - SocketAgent     The same protocol over a local TCP socket.
+
+Remote agents are sent one request per decision and answer with the index of the option they choose:
+
+    {"id": 7, "type": "elect", "game": 3, "player": 2, "role": "Fascist", "state": "...", "options": ["...", ...]}
+    {"id": 7, "choice": 1}
+
+Options are the state codes each choice leads to, from generatePSCElection or every card of the hand that could be
+played. One remote agent can sit at any number of tables, requests carry an id so answers can come back in any order.
+
+Every decision has a timeout, if the agent doesn't answer in time (or answers with nonsense) a random option is taken
+and counted in the agent's fallbacks. Backpressure comes from two places: the host never has more than tables games
+running at once, and each remote agent never has more than maxPending requests waiting on it.
+
+    agent = PipeAgent([sys.executable, "my_agent.py"])
+    H = Host(names, False, True, False, agents={0: agent}, tables=1000, timeout=0.5, seed=1)
+    H.play(10000)
+"""
+
+
+class HeuristicAgent(object):
+
+    async def start(self):
+        pass
+
+    async def elect(self, GP, player, timeout):
+        player.elect(GP.GB.state.playerDict)
+
+    async def drawAndChoose(self, GP, player, timeout):
+        player.drawAndChoose()
+
+    async def close(self):
+        pass
+
+
+HEURISTIC = HeuristicAgent()
+
+
+# Base of the remote agents, reader and writer are asyncio streams set up by start.
+class StreamAgent(object):
+
+    def __init__(self, maxPending=64):
+        self.reader = None
+        self.writer = None
+        self.slots = asyncio.Semaphore(maxPending)
+        self.pending = {}  # Request id: future waiting on the answer
+        self.nextId = 0
+        self.listener = None
+        self.requests = 0
+        self.fallbacks = 0
+        self.closed = False  # Set once the agent has gone away, after which every decision falls back
+
+    def listen(self):
+        self.listener = asyncio.ensure_future(self.readAnswers())
+
+    async def readAnswers(self):
+        while True:
+            try:
+                line = await self.reader.readline()
+            except ConnectionError:
+                break
+            if not line:
+                break
+            try:
+                answer = json.loads(line)
+                future = self.pending.pop(answer["id"])
+            except (ValueError, KeyError, TypeError):
+                continue  # Not an answer to anything still waiting, a late one after a timeout for example
+            if not future.done():
+                future.set_result(answer.get("choice"))
+        self.closed = True
+        for future in self.pending.values():  # The agent went away
+            if not future.done():
+                future.set_result(None)
+        self.pending = {}
+
+    # Sends a request and waits for the choice, None if it timed out or the agent has gone away.
+    async def ask(self, request, timeout):
+        if self.closed:
+            return None
+        async with self.slots:
+            self.nextId += 1
+            request["id"] = self.nextId
+            future = asyncio.get_running_loop().create_future()
+            self.pending[request["id"]] = future
+            try:
+                self.writer.write((json.dumps(request) + "\n").encode())
+                await self.writer.drain()
+            except (ConnectionError, BrokenPipeError):
+                self.closed = True
+                self.pending.pop(request["id"], None)
+                return None
+            try:
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                self.pending.pop(request["id"], None)
+                return None
+
+    # Asks the agent to pick one of the outcomes and moves the board to it.
+    async def choose(self, kind, GP, player, options, timeout):
+        self.requests += 1
+        request = {"type": kind, "game": GP.GB.gameNumber, "player": player.getId(), "role": player.role,
+                   "state": GP.GB.state.createString(), "options": options}
+        choice = await self.ask(request, timeout)
+        if not isinstance(choice, int) or not 0 <= choice < len(options):
+            self.fallbacks += 1
+            choice = GP.GB.rng.randrange(len(options))
+        GP.GB.state.readString(options[choice])
+
+    async def elect(self, GP, player, timeout):
+        options = list(dict.fromkeys(player.generatePSCElection(GP.GB.state.playerDict)))
+        await self.choose("elect", GP, player, options, timeout)
+
+    async def drawAndChoose(self, GP, player, timeout):
+        hand = player.drawCards()
+        options = list(dict.fromkeys(player.handOutcomes(hand)))
+        await self.choose("enact", GP, player, options, timeout)
+
+    async def close(self):
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except (ConnectionError, BrokenPipeError):
+                pass
+        if self.listener is not None:
+            await self.listener
+
+
+class PipeAgent(StreamAgent):
+
+    def __init__(self, command, maxPending=64):
+        super().__init__(maxPending)
+        self.command = command
+        self.process = None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(*self.command, stdin=asyncio.subprocess.PIPE,
+                                                            stdout=asyncio.subprocess.PIPE)
+        self.reader = self.process.stdout
+        self.writer = self.process.stdin
+        self.listen()
+
+    async def close(self):
+        await super().close()
+        if self.process is not None:
+            await self.process.wait()
+
+
+class SocketAgent(StreamAgent):
+
+    def __init__(self, host, port, maxPending=64):
+        super().__init__(maxPending)
+        self.host = host
+        self.port = port
+
+    async def start(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.listen()
+
+
+class Host(object):
+
+    def __init__(self, players, isRandom, isRole, isIntelligent, agents=None, tables=1000, timeout=1.0, log=None,
+                 seed=None):
+        self.players = list(players)
+        self.isRandom = isRandom
+        self.isRole = isRole
+        self.isIntelligent = isIntelligent
+        self.agents = dict(agents or {})  # Player id (position in players): agent, the rest are heuristic
+        self.tables = tables  # Most games running at once
+        self.timeout = timeout  # Seconds each decision may take
+        self.log = log if log is not None else gamelog.GameLog()
+        self.rng = random.Random(seed)
+        self.libWinCount = 0
+        self.fasWinCount = 0
+        self.gameCount = 0
+        self.roundCount = 0
+        self.reshuffleCount = 0
+
+    def agent(self, player):
+        return self.agents.get(player.getId(), HEURISTIC)
+
+    # Plays one game on its own table. Follows GamePlayer.game with the decisions awaited.
+    async def table(self, number, gameSeed):
+        GP = sh.GamePlayer(self.players, self.isRandom, self.isRole, self.isIntelligent, 0, self.log)
+        GP.gameCount = number  # Numbers the events, the totals are kept by the host
+        GP.setupGame(gameSeed)
+        while True:
+            GP.roundStart()
+            GP.statusUpdate()
+            GP.president = GP.callIdDict(GP.GB.state.president)
+            await self.agent(GP.president).elect(GP, GP.president, self.timeout)
+            GP.elected()
+            GP.statusUpdate()
+            GP.markState()
+            await self.agent(GP.chancellor).drawAndChoose(GP, GP.chancellor, self.timeout)
+            if GP.GB.listening:
+                GP.broadcast()
+            GP.enacted()
+            GP.statusUpdate()
+            GP.newPres()
+            if GP.gameOver():
+                break
+            await asyncio.sleep(0)  # Lets the other tables have a turn
+        GP.endGame()
+        self.libWinCount += GP.libWinCount
+        self.fasWinCount += GP.fasWinCount
+        self.gameCount += 1
+        self.roundCount += GP.roundCount
+        self.reshuffleCount += GP.reshuffleCount
+
+    async def run(self, games):
+        agents = set(self.agents.values())
+        for agent in agents:
+            await agent.start()
+        try:
+            slots = asyncio.Semaphore(self.tables)
+            running = set()
+
+            async def play(number, gameSeed):
+                try:
+                    await self.table(number, gameSeed)
+                finally:
+                    slots.release()
+
+            for number in range(0, games):
+                await slots.acquire()
+                task = asyncio.ensure_future(play(number, self.rng.getrandbits(64)))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            if running:
+                await asyncio.gather(*running)
+        finally:
+            for agent in agents:
+                await agent.close()
+        return self
+
+    def play(self, games):
+        return asyncio.run(self.run(games))
+
+    def getStats(self):
+        return {"libWinCount": self.libWinCount, "fasWinCount": self.fasWinCount, "gameCount": self.gameCount,
+                "roundCount": self.roundCount, "reshuffleCount": self.reshuffleCount}
+
+    def getWinStats(self):
+
+        print("Liberal Win Count " + str(self.libWinCount))
+        print("Fascist Win Count " + str(self.fasWinCount))
+        print("Games Played " + str(self.gameCount))
+
+
+# A remote agent which picks at random, run with "python asynchost.py --agent". Handy for trying the protocol out.
+def randomAgent(stdin=sys.stdin, stdout=sys.stdout):
+    for line in stdin:
+        request = json.loads(line)
+        stdout.write(json.dumps({"id": request["id"], "choice": random.randrange(len(request["options"]))}) + "\n")
+        stdout.flush()
+
+
+if __name__ == "__main__":
+    if "--agent" in sys.argv:
+        randomAgent()
+    else:
+        H = Host(["Finlay", "Callum", "Gareth", "Lucas", "Ollie"], False, True, False,
+                 agents={0: PipeAgent([sys.executable, __file__, "--agent"])}, seed=1)
+        H.play(1000)
+        H.getWinStats()
+        print("Fallbacks " + str(H.agents[0].fallbacks) + " of " + str(H.agents[0].requests))
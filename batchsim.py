@@ -0,0 +1,191 @@
+import numpy as np
+
+import SecretHitler as sh
+import susmatrix
+
+"""
+The Batch Simulator plays thousands of Random, Role or Intelligent games at once in lock step using NumPy arrays rather than one
+game at a time with Player objects. Every game is a row: the deck is a row of an int8 matrix of policy ids (1 Liberal,
+2 Fascist), the played counters and discard pile make up are vectors and the president is a seat index which rotates
+each round.
+
+Each step follows the same rules as the object engine so the win statistics come out the same:
+ - Seats are a random ordering of the roles and the president moves one seat along each round.
+ - The president elects any other player at random, Random and Role players both elect randomly.
+ - Once fewer than three cards are left the rest of the deck and the discard pile are shuffled together.
+ - The chancellor draws three cards. generatePSCHand makes three candidates, each one a random card from the hand.
+   Random players pick one of those at random. Role players pick one which plays their goal if there is one, otherwise
+   they pick at random. Intelligent players play cards the same way as Role players.
+ - The two cards not played go to the discard pile and the game ends when either side reaches the win condition.
+
+Intelligent games keep every game's sus matrix stacked into one (games, N, N) array, indexed by seat. Elections pick
+along the president's row and broadcasts update the chancellor's column of every game at once (see susmatrix.py). Ties
+go to the Liberals first, as they come first in the engine's playerDict, in a random order within each side as player
+ids are shuffled around the seats.
+"""
+
+
+class BatchSimulator(object):
+
+    def __init__(self, players, isRandom, isRole, games, seed=None, batchSize=100000, libPol=6, fasPol=11, wincon=5,
+                 isIntelligent=False):
+        if isinstance(players, int):
+            self.players = players
+        else:
+            self.players = len(players)
+        if not (isRandom or isRole or isIntelligent):
+            raise ValueError("The Batch Simulator only plays Random, Role or Intelligent games")
+        self.isRole = not isRandom and (isRole or isIntelligent)
+        self.isIntelligent = not isRandom and not isRole and isIntelligent
+        self.games = games
+        self.rng = np.random.default_rng(seed)
+        self.batchSize = batchSize
+        self.libPol = libPol
+        self.fasPol = fasPol
+        self.wincon = wincon
+        self.libWinCount = 0
+        self.fasWinCount = 0
+        self.gameCount = 0
+        self.roundCount = 0
+        self.reshuffleCount = 0
+
+    def run(self):
+        remaining = self.games
+        while remaining > 0:
+            size = min(self.batchSize, remaining)
+            self.playBatch(size)
+            remaining -= size
+        return self
+
+    # Plays one batch of games from start to finish and adds the results onto the totals.
+    def playBatch(self, G):
+        n = self.players
+        rng = self.rng
+        rows = np.arange(G)
+        cards = self.libPol + self.fasPol
+
+        # Seats. True for any fascist side player (Fascist or Hitler).
+        fasCount = n - sh.ROLES[n]["Liberal"]
+        seats = np.zeros((G, n), dtype=bool)
+        seats[:, :fasCount] = True
+        seats = np.take_along_axis(seats, rng.random((G, n)).argsort(axis=1), axis=1)
+
+        # Deck. Cards top..size-1 of each row are still in the deck.
+        deck = shuffledDecks(rng, np.full(G, self.libPol), np.full(G, cards), cards)
+        top = np.zeros(G, dtype=np.int64)
+        size = np.full(G, cards, dtype=np.int64)
+        deckLib = np.full(G, self.libPol, dtype=np.int64)
+        discardLib = np.zeros(G, dtype=np.int64)
+        discardFas = np.zeros(G, dtype=np.int64)
+
+        playedLib = np.zeros(G, dtype=np.int64)
+        playedFas = np.zeros(G, dtype=np.int64)
+        reshuffles = np.zeros(G, dtype=np.int64)
+        rounds = np.zeros(G, dtype=np.int64)
+        active = np.ones(G, dtype=bool)
+
+        if self.isIntelligent:
+            cls = sh.IntelligentRolePlayer
+            sus = np.zeros((G, n, n), dtype=susmatrix.susDtype(cls.libWeight, cls.fasWeight, cls.susFloor))
+            order = (rng.random((G, n)) + seats).argsort(axis=1)  # Liberal seats then Fascist seats
+            termLimited = np.full(G, -1)
+
+        president = 0
+        while active.any():
+            # Reshuffle any active game which can't draw a full hand.
+            short = active & (size - top < 3)
+            if short.any():
+                libs = deckLib[short] + discardLib[short]
+                total = size[short] - top[short] + discardLib[short] + discardFas[short]
+                deck[short] = shuffledDecks(rng, libs, total, cards)
+                top[short] = 0
+                size[short] = total
+                deckLib[short] = libs
+                discardLib[short] = 0
+                discardFas[short] = 0
+                reshuffles[short] += 1
+
+            hand = deck[rows[:, None], np.minimum(top[:, None] + np.arange(3), cards - 1)]
+            handLib = (hand == 1).sum(axis=1)
+            top += 3 * active
+            deckLib -= handLib * active
+
+            # Election. Any other player than the president at random, or by sus for Intelligent players.
+            if self.isIntelligent:
+                lowest = np.where(seats[:, president], cls.fasElect == "min", cls.libElect == "min")
+                chancellor = susmatrix.pick(sus, president, lowest, termLimited, order)
+                termLimited[:] = president
+            else:
+                chancellor = (president + rng.integers(1, n, G)) % n
+            goal = np.where(seats[rows, chancellor], 2, 1)
+
+            picks = hand[rows[:, None], rng.integers(0, 3, (G, 3))]
+            if self.isRole:
+                played = np.where((picks == goal[:, None]).any(axis=1), goal, picks[:, 0])
+            else:
+                played = picks[:, 0]
+
+            isLib = (played == 1) & active
+            isFas = (played == 2) & active
+            playedLib += isLib
+            playedFas += isFas
+            discardLib += (handLib - isLib) * active
+            discardFas += (3 - handLib - isFas) * active
+            rounds += active
+            if self.isIntelligent:
+                susmatrix.update(sus, chancellor, played, cls.libWeight, cls.fasWeight, cls.susFloor, active)
+
+            active &= (playedLib < self.wincon) & (playedFas < self.wincon)
+            president = (president + 1) % n
+
+        libWins = int((playedLib > playedFas).sum())
+        self.libWinCount += libWins
+        self.fasWinCount += G - libWins
+        self.gameCount += G
+        self.roundCount += int(rounds.sum())
+        self.reshuffleCount += int(reshuffles.sum())
+
+    def getStats(self):
+        return {"libWinCount": self.libWinCount, "fasWinCount": self.fasWinCount, "gameCount": self.gameCount,
+                "roundCount": self.roundCount, "reshuffleCount": self.reshuffleCount}
+
+    def getWinStats(self):
+
+        print("Liberal Win Count " + str(self.libWinCount))
+        print("Fascist Win Count " + str(self.fasWinCount))
+        print("Games Played " + str(self.gameCount))
+
+
+# Builds one shuffled deck per row with the given number of Liberal cards out of total. Rows are padded out to width
+# with Fascist cards past their total, these are never drawn.
+def shuffledDecks(rng, libs, total, width):
+    position = np.arange(width)
+    keys = rng.random((len(libs), width))
+    keys[position >= total[:, None]] = 2.0  # Padding sorts after every real card
+    order = keys.argsort(axis=1)
+    deck = np.where(position < libs[:, None], 1, 2).astype(np.int8)
+    return np.take_along_axis(deck, order, axis=1)
+
+
+# Plays the same configuration through both the batch simulator and the object engine and prints the Liberal win rate
+# of each with the difference measured in standard errors.
+def compare(players, isRandom, isRole, games, batchGames=1000000, seed=None, workers=None, isIntelligent=False):
+    import tournament
+
+    batch = BatchSimulator(players, isRandom, isRole, batchGames, seed=seed, isIntelligent=isIntelligent).run()
+    engine = tournament.Tournament(players, isRandom, isRole, isIntelligent, games, workers=workers, seed=seed).run()
+
+    p1 = batch.libWinCount / batch.gameCount
+    p2 = engine.libWinCount / engine.gameCount
+    error = (p1 * (1 - p1) / batch.gameCount + p2 * (1 - p2) / engine.gameCount) ** 0.5
+    print("Batch Liberal Win Rate " + str(p1))
+    print("Engine Liberal Win Rate " + str(p2))
+    print("Difference in Standard Errors " + str((p1 - p2) / error if error else 0.0))
+    return p1, p2
+
+
+if __name__ == "__main__":
+    names = ["Finlay", "Callum", "Gareth", "Lucas", "Ollie"]
+    compare(names, True, False, 10000, seed=1)
+    compare(names, False, True, 10000, seed=1)
+    compare(names, False, False, 10000, seed=1, isIntelligent=True)
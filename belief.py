@@ -0,0 +1,161 @@
+import itertools
+
+import numpy as np
+
+"""
+The Belief keeps every Bayesian Player's exact posterior over who holds which role, rather than a running sus score.
+Every way the roles of the table could have been dealt is listed once (at most 840 of them, for 10 players) and each
+player's posterior gives a probability to every one of them, zero for any that goes against what they know.
+
+Everybody sees the same policies played, so the likelihood of what has happened so far is the same for every player.
+It is kept once for the table, in weights, and a player's posterior is their prior times the weights, normalised.
+The prior of a deal is the chance of GameBoard.assignRoles dealing it (see dealChances) if it fits what the player
+knows and 0 if it doesn't. assignRoles picks a role type at random for each player in turn rather than shuffling the
+roles, so deals aren't all equally likely: the first players are more often on the Fascist side. A broadcast multiplies the weights by the chance of the chancellor playing
+what they played under each deal, so the posteriors are kept up to date with one multiplication and nothing is worked
+out again from the start of the game. The chance of a policy depends only on whether the chancellor is a Liberal or
+on the Fascist side:
+
+    libPlaysLib  P(a Liberal chancellor plays a Liberal policy)
+    fasPlaysLib  P(a Fascist or Hitler chancellor plays a Liberal policy)
+
+Both have to be strictly between 0 and 1, or a single surprising policy would rule every deal out.
+
+What a player knows is their own role, and, as in the board game, Fascists know every role and so does Hitler at 5 or
+6 players. Their posterior is then certain from the start.
+
+    B = Belief(["Liberal", "Fascist", "Liberal", "Hitler", "Liberal"])
+    B.update(chancellor=1, played=2)
+    B.fascist(0)  # P(each player is a Fascist or Hitler) as player 0 sees it
+"""
+
+ROLE_CODES = {"Liberal": 0, "Fascist": 1, "Hitler": 2}
+
+DEALS = {}  # (Liberal, Fascist, Hitler) counts: every deal, see deals
+DEAL_CHANCES = {}  # (Liberal, Fascist, Hitler) counts: chance of each deal, see dealChances
+FASCIST_DEALS = {}  # (Liberal, Fascist, Hitler) counts: where each player is on the Fascist side in every deal
+ROLE_DEALS = {}  # (Liberal, Fascist, Hitler) counts: (roles, players, deals) 1 where the player has the role
+LIKELIHOODS = {}  # (players, libPlaysLib, fasPlaysLib): likelihood table, see likelihoods
+
+
+# Every deal of the given roles as a (deals, players) array of role codes. Kept for each table size once made.
+def deals(roles):
+    counts = tuple(roles.count(x) for x in ("Liberal", "Fascist", "Hitler"))
+    if counts not in DEALS:
+        players = sum(counts)
+        rows = []
+        for fascists in itertools.combinations(range(0, players), counts[1] + counts[2]):
+            for hitlers in itertools.combinations(fascists, counts[2]):
+                row = [0] * players
+                for x in fascists:
+                    row[x] = 2 if x in hitlers else 1
+                rows.append(row)
+        table = np.array(rows, dtype=np.int8).reshape((-1, players))
+        table.setflags(write=False)
+        DEALS[counts] = table
+        fascist = (table != 0).astype(np.float64)
+        fascist.setflags(write=False)
+        FASCIST_DEALS[counts] = fascist
+        byRole = (table.T[None, :, :] == np.arange(3, dtype=np.int8)[:, None, None]).astype(np.float64)
+        byRole.setflags(write=False)
+        ROLE_DEALS[counts] = byRole
+    return DEALS[counts]
+
+
+# The chance of GameBoard.assignRoles dealing each deal, as a (deals,) array. Every player in turn gets one of the role
+# types which still have roles left, each as likely as the others.
+def dealChances(roles):
+    counts = tuple(roles.count(x) for x in ("Liberal", "Fascist", "Hitler"))
+    if counts not in DEAL_CHANCES:
+        table = deals(roles)
+        left = np.tile(np.array(counts), (len(table), 1))  # Roles of each type left to deal, for every deal
+        chances = np.ones(len(table))
+        rows = np.arange(len(table))
+        for player in range(0, table.shape[1]):
+            chances /= (left > 0).sum(axis=1)
+            left[rows, table[:, player]] -= 1
+        chances.setflags(write=False)
+        DEAL_CHANCES[counts] = chances
+    return DEAL_CHANCES[counts]
+
+
+# As deals, 1.0 where the player is a Fascist or Hitler and 0.0 where they are a Liberal.
+def fascistDeals(roles):
+    deals(roles)
+    return FASCIST_DEALS[tuple(roles.count(x) for x in ("Liberal", "Fascist", "Hitler"))]
+
+
+# Table of P(policy | deal) for every chancellor and policy, shape (players, 2, deals), [c, 0] for a Liberal policy
+# played by player c and [c, 1] for a Fascist one.
+def likelihoods(table, libPlaysLib, fasPlaysLib):
+    key = (table.shape[1], table.shape[0], libPlaysLib, fasPlaysLib)
+    if key not in LIKELIHOODS:
+        if not (0 < libPlaysLib < 1 and 0 < fasPlaysLib < 1):
+            raise ValueError("policy likelihoods must be strictly between 0 and 1")
+        liberal = np.where(table.T != 0, fasPlaysLib, libPlaysLib)  # (players, deals) P(Liberal policy)
+        likelihood = np.stack([liberal, 1 - liberal], axis=1)
+        likelihood.setflags(write=False)
+        LIKELIHOODS[key] = likelihood
+    return LIKELIHOODS[key]
+
+
+# Whether a player with this role sees every role at the start, following the rules of the board game.
+def knowsRoles(role, players):
+    return role == "Fascist" or (role == "Hitler" and players <= 6)
+
+
+class Belief(object):
+
+    __slots__ = ("deals", "fascistDeals", "likelihood", "priors", "weights", "rows")
+
+    def __init__(self, roles, libPlaysLib=0.58, fasPlaysLib=0.11):
+        roles = list(roles)
+        players = len(roles)
+        self.deals = deals(roles)
+        self.fascistDeals = fascistDeals(roles)  # (deals, players)
+        self.likelihood = likelihoods(self.deals, libPlaysLib, fasPlaysLib)
+        truth = np.array([ROLE_CODES[x] for x in roles], dtype=np.intp)
+
+        counts = tuple(roles.count(x) for x in ("Liberal", "Fascist", "Hitler"))
+        # (holders, deals) the chance of every deal giving the holder their role
+        self.priors = ROLE_DEALS[counts][truth, np.arange(players)] * dealChances(roles)
+        dealt = np.flatnonzero((self.deals == truth).all(axis=1))  # The deal that actually happened
+        for holder, role in enumerate(roles):
+            if knowsRoles(role, players):
+                self.priors[holder] = 0.0
+                self.priors[holder, dealt] = 1.0
+        self.weights = np.ones(len(self.deals))  # Likelihood of the policies played so far under each deal
+        self.rows = {}  # Holder: P(fascist side) of every player, until the next update
+
+    # The chancellor (player id) played a policy, 1 for Liberal and 2 for Fascist.
+    def update(self, chancellor, played):
+        self.weights *= self.likelihood[chancellor, played - 1]
+        self.rows = {}
+
+    # One holder's probability of every deal.
+    def posterior(self, holder):
+        posterior = self.priors[holder] * self.weights
+        return posterior / posterior.sum()
+
+    # P(player is a Fascist or Hitler) for every holder (row) and player (column).
+    def fascistMatrix(self):
+        posteriors = self.priors * self.weights
+        return (posteriors @ self.fascistDeals) / posteriors.sum(axis=1)[:, None]
+
+    # One holder's P(fascist side) of every player as python floats, 0 or 1 for themselves.
+    def fascist(self, holder):
+        row = self.rows.get(holder)
+        if row is None:
+            posterior = self.priors[holder] * self.weights
+            row = ((posterior @ self.fascistDeals) / posterior.sum()).tolist()
+            self.rows[holder] = row
+        return row
+
+    # The player holder elects: the least likely to be fascist side if lowest is True, the most likely otherwise. The
+    # holder and excluded (the term limited player) are never picked. Ties go to the lowest player id.
+    def pick(self, holder, lowest, excluded=None):
+        row = self.fascist(holder)
+        candidates = [x for x in range(0, len(row)) if x != holder and x != excluded]
+        if lowest:
+            return min(candidates, key=row.__getitem__)
+        return max(candidates, key=row.__getitem__)
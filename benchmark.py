@@ -0,0 +1,229 @@
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import types
+
+import gamelog
+import SecretHitler as sh
+
+"""
+Benchmarks for the hot paths of the engine and for whole games. Every benchmark reports a rate (calls or games per
+second, higher is better) taking the best of a few repeats. Results are written out as JSON and can be compared against
+a stored baseline file, any benchmark which has slowed down by more than the threshold is reported as a regression and
+the script exits with a non zero status.
+
+The footprint benchmarks measure the memory held by one finished game's board in bytes (lower is better), for keeping
+large numbers of games in memory at once. A footprint over the budget fails the run as well.
+
+    python benchmark.py --output results.json
+    python benchmark.py --baseline results.json --threshold 0.1
+    python benchmark.py --only footprint --budget 7000
+"""
+
+PLAYER_CLASSES = {"Random": (True, False, False), "Role": (False, True, False), "Intelligent": (False, False, True)}
+NAMES = ["Finlay", "Callum", "Gareth", "Lucas", "Ollie", "Ailsa", "Jack", "Alice", "Bob", "Ben"]
+FOOTPRINT_BUDGET = 7000  # Bytes for one game of any size, including its 2.5KB seeded random.Random
+LOWER_IS_BETTER = ["bytes"]
+
+
+# A board part way through a game, with a president in place and some cards in the discard pile.
+def createBoard(players=5, seed=0):
+    random.seed(seed)
+    GB = sh.GameBoard(NAMES[:players], False, True, False)
+    GB.state.president = 0
+    GB.state.termLimited = 1
+    hand = GB.playerList[0].drawCards()
+    GB.state.updateDiscardDeck(hand[1:])
+    GB.state.updatePlayedCards(hand[0])
+    return GB
+
+
+# Calls fn number times and returns calls per second.
+def timeCalls(fn, number):
+    start = time.perf_counter()
+    for x in range(0, number):
+        fn()
+    return number / (time.perf_counter() - start)
+
+
+def benchCreateString(number):
+    state = createBoard().state
+    return timeCalls(state.createString, number)
+
+
+# The code is cached, so the chancellor is changed before each call to make it build the changed segment again.
+def benchCreateStringChanged(number):
+    state = createBoard().state
+
+    def create():
+        state.chancellor = 3 if state.chancellor == 2 else 2
+        state.createString()
+    return timeCalls(create, number)
+
+
+def benchReadString(number):
+    state = createBoard().state
+    code = state.createString()
+    return timeCalls(lambda: state.readString(code), number)
+
+
+# The deck is put back before each draw, which is included in the time.
+def benchDrawCards(number):
+    GB = createBoard()
+    player = GB.playerList[0]
+    deck = GB.state.deck.copy()
+
+    def draw():
+        GB.state.deck = deck.copy()
+        player.drawCards()
+    return timeCalls(draw, number)
+
+
+def benchGeneratePSCHand(number):
+    GB = createBoard()
+    player = GB.playerList[0]
+    hand = player.drawCards()
+    return timeCalls(lambda: player.generatePSCHand(hand), number)
+
+
+def benchGeneratePSCElection(number):
+    GB = createBoard()
+    player = GB.playerList[0]
+    return timeCalls(lambda: player.generatePSCElection(GB.state.playerDict), number)
+
+
+MICRO_BENCHMARKS = {"createString": benchCreateString, "createStringChanged": benchCreateStringChanged,
+                    "readString": benchReadString, "drawCards": benchDrawCards,
+                    "generatePSCHand": benchGeneratePSCHand, "generatePSCElection": benchGeneratePSCElection}
+
+
+# Whole games with no logging, returns games per second.
+def benchGames(playerClass, players, games):
+    isRandom, isRole, isIntelligent = PLAYER_CLASSES[playerClass]
+    random.seed(players)
+    start = time.perf_counter()
+    sh.GamePlayer(NAMES[:players], isRandom, isRole, isIntelligent, games, gamelog.GameLog())
+    return games / (time.perf_counter() - start)
+
+
+# Bytes held by everything reachable from root and not reachable from shared. Classes, modules and functions are left
+# out as are the small ints, None and the bools which are shared by the whole interpreter.
+def footprint(root, shared=()):
+    seen = set(id(x) for x in shared)
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or obj is None or obj is True or obj is False:
+            continue
+        if isinstance(obj, (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)):
+            continue
+        if type(obj) is int and -5 <= obj <= 256:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total
+
+
+# Memory held by the board of one seeded game once it has been played. The names, the log and the outcome cache are
+# shared between games so aren't counted.
+def benchFootprint(playerClass, players):
+    isRandom, isRole, isIntelligent = PLAYER_CLASSES[playerClass]
+    log = gamelog.GameLog()
+    GP = sh.GamePlayer(NAMES[:players], isRandom, isRole, isIntelligent, 0, log)
+    GP.game(players)
+    return footprint(GP.GB, [log, sh.OUTCOMES, sh.LIBERAL, sh.FASCIST] + NAMES)
+
+
+# Every benchmark as (name, unit, function taking no arguments).
+def createBenchmarks(number, games):
+    benchmarks = []
+    for name in MICRO_BENCHMARKS:
+        benchmarks.append((name, "calls/s", lambda fn=MICRO_BENCHMARKS[name]: fn(number)))
+    for playerClass in PLAYER_CLASSES:
+        for players in range(5, 11):
+            benchmarks.append(("games/" + playerClass + "/" + str(players), "games/s",
+                               lambda c=playerClass, p=players: benchGames(c, p, games)))
+    for playerClass in PLAYER_CLASSES:
+        for players in range(5, 11):
+            benchmarks.append(("footprint/" + playerClass + "/" + str(players), "bytes",
+                               lambda c=playerClass, p=players: benchFootprint(c, p)))
+    return benchmarks
+
+
+def run(number=20000, games=200, repeat=3, only=None):
+    results = {}
+    for name, unit, fn in createBenchmarks(number, games):
+        if only and only not in name:
+            continue
+        if unit in LOWER_IS_BETTER:
+            rate = min(fn() for x in range(0, repeat))
+        else:
+            rate = max(fn() for x in range(0, repeat))
+        results[name] = {"rate": rate, "unit": unit}
+        print(name.ljust(28) + ("%.1f " % rate) + unit)
+    return {"python": platform.python_version(), "machine": platform.machine(), "time": time.time(),
+            "number": number, "games": games, "repeat": repeat, "results": results}
+
+
+# Returns a list of (name, baseline rate, current rate, change) for everything that got slower than the threshold, or
+# bigger for the footprints. Changes are given so that negative is always worse.
+def compare(baseline, current, threshold):
+    regressions = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        old = baseline["results"][name]["rate"]
+        change = (result["rate"] - old) / old
+        if result["unit"] in LOWER_IS_BETTER:
+            change = -change
+        print(name.ljust(28) + ("%+.1f%%" % (change * 100)))
+        if change < -threshold:
+            regressions.append((name, old, result["rate"], change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Secret Hitler engine")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results against this JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="fractional slow down which counts as a regression (default 0.1)")
+    parser.add_argument("--number", type=int, default=20000, help="calls per micro benchmark")
+    parser.add_argument("--games", type=int, default=200, help="games per game benchmark")
+    parser.add_argument("--repeat", type=int, default=3, help="repeats, the best is kept")
+    parser.add_argument("--only", help="only run benchmarks with this in their name")
+    parser.add_argument("--budget", type=int, default=FOOTPRINT_BUDGET,
+                        help="most bytes one game may hold (default " + str(FOOTPRINT_BUDGET) + ")")
+    args = parser.parse_args(argv)
+
+    current = run(args.number, args.games, args.repeat, args.only)
+
+    failed = False
+    for name, result in current["results"].items():
+        if result["unit"] == "bytes" and result["rate"] > args.budget:
+            print("Over Budget: " + name + " " + str(result["rate"]) + " bytes")
+            failed = True
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for name, old, new, change in regressions:
+            print("Regression: " + name + (" %.1f -> %.1f (%+.1f%%)" % (old, new, change * 100)))
+        if regressions:
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+
+import gamelog
+import SecretHitler as sh
+import tournament
+
+"""
+Command line entry point for batch runs. Plays any number of games with a heuristic chosen for each seat and streams
+one compact JSON line per game to a file (or stdout) as the games finish, so other tools can read the results while a
+long run is still going. Games are played in chunks over a pool of processes like a Tournament, every chunk seeded
+from the run's seed, so the same seed always gives the same games (though chunks may finish in any order).
+
+    python cli.py --players 7 --heuristic Role --seat 0=Intelligent --games 100000 --seed 1 --output games.jsonl
+
+Each line looks like:
+
+    {"game": 12, "seed": ..., "winner": "Liberal", "rounds": 8, "reshuffles": 1, "playedLib": 5, "playedFas": 3,
+     "seats": [3, 0, ...], "players": [{"name": "Player0", "heuristic": "Intelligent", "role": "Liberal", "won": true,
+     "presidencies": 2, "chancellorships": 1, "playedLib": 1, "playedFas": 0}, ...]}
+
+Players are listed by player id, seats is the player ids in seating order with the first president first.
+"""
+
+
+# Game log sink which turns each game's events into its result line.
+class ResultSink(object):
+
+    def __init__(self, names, heuristics, gameOffset=0):
+        self.level = gamelog.INFO
+        self.names = names
+        self.heuristics = heuristics
+        self.gameOffset = gameOffset
+        self.ids = dict((name, id) for id, name in enumerate(names))
+        self.lines = []
+        self.current = None
+
+    def handle(self, event):
+        data = event.data
+        if event.kind == gamelog.GAME_START:
+            self.current = {"game": event.game + self.gameOffset, "seed": data["seed"], "seats": data["seats"],
+                            "players": [{"name": self.names[x], "heuristic": self.heuristics[x],
+                                         "role": data["roles"][x], "won": False, "presidencies": 0,
+                                         "chancellorships": 0, "playedLib": 0, "playedFas": 0}
+                                        for x in range(0, len(self.names))]}
+        elif self.current is None:
+            return
+        elif event.kind == gamelog.POLICY_ENACTED:
+            player = self.current["players"][self.ids[data["chancellor"]]]
+            player["chancellorships"] += 1
+            player["playedLib" if data["policy"] == "Liberal" else "playedFas"] += 1
+        elif event.kind == gamelog.GAME_END:
+            game = self.current
+            seats = game["seats"]
+            for round in range(0, data["rounds"]):  # The president moves one seat along each round
+                game["players"][seats[round % len(seats)]]["presidencies"] += 1
+            for player in game["players"]:
+                player["won"] = (player["role"] == "Liberal") == (data["winner"] == "Liberal")
+            line = {"game": game["game"], "seed": game["seed"], "winner": data["winner"], "rounds": data["rounds"],
+                    "reshuffles": data["reshuffles"], "playedLib": data["playedLib"], "playedFas": data["playedFas"],
+                    "seats": seats, "players": game["players"]}
+            self.lines.append(json.dumps(line, separators=(",", ":")))
+            self.current = None
+
+    def close(self):
+        pass
+
+
+# Runs in the worker process, returns the result lines of the chunk.
+def playChunk(task):
+    names, heuristics, games, seed, gameOffset = task
+    sink = ResultSink(names, heuristics, gameOffset)
+    sh.GamePlayer(names, False, False, False, games, gamelog.GameLog([sink]), seed, heuristics=heuristics)
+    return sink.lines
+
+
+def createTasks(names, heuristics, games, seed, chunkSize):
+    tasks = []
+    chunk = 0
+    while chunk * chunkSize < games:
+        size = min(chunkSize, games - chunk * chunkSize)
+        tasks.append((names, heuristics, size, tournament.chunkSeed(seed, chunk), chunk * chunkSize))
+        chunk += 1
+    return tasks
+
+
+# Plays the games, writing lines to output as each chunk finishes. Returns the Liberal and Fascist win counts.
+def run(names, heuristics, games, seed, workers, chunkSize, output):
+    tasks = createTasks(names, heuristics, games, seed, chunkSize)
+    wins = {"Liberal": 0, "Fascist": 0}
+
+    def write(lines):
+        for line in lines:
+            output.write(line + "\n")
+            wins["Liberal" if '"winner":"Liberal"' in line else "Fascist"] += 1
+        output.flush()
+
+    if workers == 1:
+        for task in tasks:
+            write(playChunk(task))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for lines in pool.imap_unordered(playChunk, tasks):
+                write(lines)
+    return wins["Liberal"], wins["Fascist"]
+
+
+# "3=Intelligent" to (3, "Intelligent").
+def seatHeuristic(text):
+    seat, _, name = text.partition("=")
+    if name not in sh.HEURISTICS:
+        raise argparse.ArgumentTypeError("unknown heuristic " + name + ", choose from " + ", ".join(sh.HEURISTICS))
+    return int(seat), name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play Secret Hitler games headless and stream the results as JSONL")
+    parser.add_argument("--players", type=int, default=5, choices=sorted(sh.ROLES), help="players at the table")
+    parser.add_argument("--heuristic", default="Role", choices=sorted(sh.HEURISTICS),
+                        help="heuristic for every seat not given with --seat (default Role)")
+    parser.add_argument("--seat", type=seatHeuristic, action="append", default=[], metavar="ID=HEURISTIC",
+                        help="heuristic for one player id, can be given more than once")
+    parser.add_argument("--games", type=int, default=1000, help="games to play")
+    parser.add_argument("--seed", type=int, help="seed for the whole run, random if not given")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to play games in")
+    parser.add_argument("--chunk-size", type=int, default=100, help="games each worker plays before reporting")
+    parser.add_argument("--output", default="-", help="file to write the results to, - for stdout (the default)")
+    args = parser.parse_args(argv)
+
+    names = ["Player" + str(x) for x in range(0, args.players)]
+    heuristics = [args.heuristic] * args.players
+    for seat, name in args.seat:
+        if not 0 <= seat < args.players:
+            parser.error("--seat " + str(seat) + " is not a player id")
+        heuristics[seat] = name
+    seed = args.seed if args.seed is not None else random.getrandbits(64)
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        libWins, fasWins = run(names, heuristics, args.games, seed, args.workers, args.chunk_size, output)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    sys.stderr.write("Seed " + str(seed) + ", Liberal Win Count " + str(libWins) + ", Fascist Win Count " +
+                     str(fasWins) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
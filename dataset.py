@@ -0,0 +1,239 @@
+import json
+import multiprocessing
+import os
+import random
+
+import numpy as np
+
+import features
+import gamelog
+import SecretHitler as sh
+import tournament
+
+"""
+Self-play datasets for training. Games are played in chunks over a pool of processes, seeded per chunk like a
+Tournament, and every decision point of every game becomes one row (see features.py for what a row holds):
+
+    features  float32 (FEATURES,)  The state as the deciding player sees it
+    mask      bool (ACTIONS,)      The legal actions
+    action    int16                The action taken
+    reward    int8                 1 if the deciding player's side won the game, -1 if it lost
+    game      int64                Game number in the dataset
+    round     int16
+    kind      int8                 features.ELECT or features.ENACT
+    player    int8                 Player id of the deciding player
+    role      int8                 Their role, an index of features.ROLES
+
+Rows are written to a directory in shards, each column of a shard its own .npy file, and index.json lists the shards
+with their row counts. The index is written again after every shard so the rows so far can be loaded while a long run
+is still going. Chunks are written in order, so the same seed gives the same files however many workers there are.
+
+A Dataset opens the shards memory mapped, so training reads rows straight from the files without loading or copying
+them:
+
+    generate("selfplay", names, ["Intelligent"] * 7, games=100000, seed=1)
+    D = Dataset("selfplay")
+    for batch in D.batches(4096):
+        batch["features"], batch["mask"], batch["action"], batch["reward"]
+"""
+
+COLUMNS = [("features", np.float32, (features.FEATURES,)), ("mask", np.bool_, (features.ACTIONS,)),
+           ("action", np.int16, ()), ("reward", np.int8, ()), ("game", np.int64, ()), ("round", np.int16, ()),
+           ("kind", np.int8, ()), ("player", np.int8, ()), ("role", np.int8, ())]
+
+INDEX = "index.json"
+VERSION = 1
+
+
+# Plays one game like GamePlayer.game, noting each decision as it is made. Rows are dictionaries of the columns.
+def playGame(GP, gameSeed, gameNumber):
+    rows = []
+    GP.gameCount = gameNumber
+    GP.setupGame(gameSeed)
+    GB = GP.GB
+    while True:
+        GP.roundStart()
+        GP.statusUpdate()
+        GP.president = GP.callIdDict(GB.state.president)
+        candidateList = GB.state.playerDict
+        row = features.encode(GB, GP.president, features.ELECT)
+        mask = features.electionMask(GP.president, candidateList)
+        GP.president.elect(candidateList)
+        GP.elected()
+        GP.statusUpdate()
+        rows.append(decision(GP, GP.president, features.ELECT, row, mask, GP.chancellor.getId()))
+
+        GP.markState()
+        row = features.encode(GB, GP.chancellor, features.ENACT)
+        GP.chancellor.drawAndChoose()
+        played = features.PLAY_LIBERAL if GB.state.playedLib > GP.lastPlayed[0] else features.PLAY_FASCIST
+        liberalCards = bytes(GB.state.discardDeck.cards[-2:]).count(b"1") + (played == features.PLAY_LIBERAL)
+        features.setHand(row, liberalCards)
+        rows.append(decision(GP, GP.chancellor, features.ENACT, row, features.handMask(liberalCards), played))
+        if GB.listening:
+            GP.broadcast()
+        GP.enacted()
+        GP.statusUpdate()
+        GP.newPres()
+        if GP.gameOver():
+            break
+    GP.endGame()
+
+    liberalWin = GB.state.playedLib > GB.state.playedFas
+    for row in rows:
+        row["reward"] = 1 if (row["role"] == 0) == liberalWin else -1
+    return rows
+
+
+def decision(GP, player, kind, row, mask, action):
+    return {"features": row, "mask": mask, "action": action, "reward": 0, "game": GP.gameCount, "round": GP.round,
+            "kind": kind, "player": player.getId(), "role": features.ROLES.index(player.role)}
+
+
+# Runs in the worker process. Returns the chunk's rows as one array for each column.
+def playChunk(task):
+    players, heuristics, games, seed, gameOffset = task
+    GP = sh.GamePlayer(players, False, False, False, 0, gamelog.GameLog(), heuristics=heuristics)
+    rng = random.Random(seed)
+    rows = []
+    for x in range(0, games):
+        rows.extend(playGame(GP, rng.getrandbits(64), gameOffset + x))
+        GP.reset()
+    return dict((name, np.array([row[name] for row in rows], dtype=dtype).reshape((len(rows),) + shape))
+                for name, dtype, shape in COLUMNS)
+
+
+def createTasks(players, heuristics, games, seed, chunkSize):
+    tasks = []
+    chunk = 0
+    while chunk * chunkSize < games:
+        size = min(chunkSize, games - chunk * chunkSize)
+        tasks.append((list(players), list(heuristics), size, tournament.chunkSeed(seed, chunk), chunk * chunkSize))
+        chunk += 1
+    return tasks
+
+
+# Plays the games and writes their rows to the directory at path. Returns the Dataset.
+def generate(path, players, heuristics, games, seed=None, workers=None, chunkSize=100, shardSize=100000):
+    seed = seed if seed is not None else random.getrandbits(64)
+    workers = workers or os.cpu_count()
+    tasks = createTasks(players, heuristics, games, seed, chunkSize)
+    writer = ShardWriter(path, shardSize, {"players": list(players), "heuristics": list(heuristics), "games": games,
+                                           "seed": seed})
+    if workers == 1:
+        for task in tasks:
+            writer.write(playChunk(task))
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for chunk in pool.imap(playChunk, tasks):
+                writer.write(chunk)
+    writer.close()
+    return Dataset(path)
+
+
+"""
+The Shard Writer fills a buffer of shardSize rows for each column and saves it as a shard when it is full, so memory use
+stays at one shard however many rows are written.
+"""
+
+
+class ShardWriter(object):
+
+    def __init__(self, path, shardSize=100000, meta=None):
+        self.path = path
+        self.shardSize = shardSize
+        self.meta = dict(meta or {})  # Kept in the index, the settings the rows were made with
+        self.buffers = dict((name, np.empty((shardSize,) + shape, dtype=dtype)) for name, dtype, shape in COLUMNS)
+        self.filled = 0
+        self.shards = []
+        os.makedirs(path, exist_ok=True)
+
+    def write(self, columns):
+        rows = len(columns["action"])
+        done = 0
+        while done < rows:
+            take = min(rows - done, self.shardSize - self.filled)
+            for name, buffer in self.buffers.items():
+                buffer[self.filled:self.filled + take] = columns[name][done:done + take]
+            self.filled += take
+            done += take
+            if self.filled == self.shardSize:
+                self.flush()
+
+    def flush(self):
+        if self.filled == 0:
+            return
+        name = "shard-%05d" % len(self.shards)
+        for column, buffer in self.buffers.items():
+            np.save(os.path.join(self.path, name + "-" + column + ".npy"), buffer[:self.filled])
+        self.shards.append({"name": name, "rows": self.filled})
+        self.filled = 0
+        self.writeIndex()
+
+    # Written to a temporary file first so a reader never sees half an index.
+    def writeIndex(self):
+        index = {"version": VERSION, "features": features.FEATURES, "actions": features.ACTIONS,
+                 "layout": features.LAYOUT, "columns": [name for name, dtype, shape in COLUMNS],
+                 "rows": sum(x["rows"] for x in self.shards), "shards": self.shards, "meta": self.meta}
+        temporary = os.path.join(self.path, INDEX + ".tmp")
+        with open(temporary, "w") as f:
+            json.dump(index, f)
+        os.replace(temporary, os.path.join(self.path, INDEX))
+
+    def close(self):
+        self.flush()
+        self.writeIndex()
+
+
+"""
+A Dataset reads the shards listed in a directory's index, each column memory mapped the first time it is used.
+"""
+
+
+class Dataset(object):
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX)) as f:
+            self.index = json.load(f)
+        if self.index["features"] != features.FEATURES or self.index["actions"] != features.ACTIONS:
+            raise ValueError(path + " was made with a different feature layout")
+        self.shards = self.index["shards"]
+        self.starts = np.cumsum([0] + [x["rows"] for x in self.shards])  # First row of each shard
+        self.maps = {}  # (shard, column): memory map
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def column(self, shard, name):
+        if (shard, name) not in self.maps:
+            path = os.path.join(self.path, self.shards[shard]["name"] + "-" + name + ".npy")
+            self.maps[(shard, name)] = np.load(path, mmap_mode="r")
+        return self.maps[(shard, name)]
+
+    # Every column of one shard, memory mapped.
+    def shard(self, shard, columns=None):
+        return dict((name, self.column(shard, name)) for name in (columns or self.index["columns"]))
+
+    # One row as a dictionary.
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        shard = int(np.searchsorted(self.starts, index, side="right")) - 1
+        offset = index - int(self.starts[shard])
+        return dict((name, self.column(shard, name)[offset]) for name in self.index["columns"])
+
+    # Yields batches of up to size rows as dictionaries of views into the maps. Batches don't cross shards, so nothing
+    # is copied, the last batch of each shard can be short.
+    def batches(self, size, columns=None):
+        for shard in range(0, len(self.shards)):
+            maps = self.shard(shard, columns)
+            for start in range(0, self.shards[shard]["rows"], size):
+                yield dict((name, values[start:start + size]) for name, values in maps.items())
+
+
+if __name__ == "__main__":
+    D = generate("selfplay", ["Finlay", "Callum", "Gareth", "Lucas", "Ollie"], ["Intelligent"] * 5, 1000, seed=1)
+    print(str(len(D)) + " decisions in " + str(len(D.shards)) + " shards")
@@ -0,0 +1,210 @@
+import operator
+
+import numpy as np
+
+import features
+import gamelog
+import SecretHitler as sh
+import tournament
+
+"""
+Environments let an outside agent play chosen seats of a game one decision at a time, in the manner of a gym
+environment. Every other seat is played by its heuristic as usual. Observations, legal masks and actions are the ones
+of the self-play datasets (see features.py), so an agent trained on a dataset can be dropped straight in:
+
+ - reset()       Starts a new game and plays it up to the first decision of a controlled seat. Returns the
+                 observation and legal mask.
+ - step(action)  Takes the action for the controlled seat which is deciding, then plays on to the next decision of a
+                 controlled seat or the end of the game. Returns the observation, mask, reward and whether the game
+                 is over.
+
+The reward is 0 until the game ends, then 1 or -1 for the side of the seat which took the last action. With more than
+one controlled seat every seat's result is in seatRewards (0 for seats nobody controls) and player is the seat deciding
+now. Once a game is over the observation and mask are all zero until reset. Actions can be ints or NumPy integers. An
+action the mask doesn't allow raises a ValueError and leaves the game as it was.
+
+    E = Env(names, ["Role"] * 7, seats=[0], seed=1)
+    obs, mask = E.reset()
+    while True:
+        obs, mask, reward, done = E.step(agent(obs, mask))
+        if done:
+            break
+
+The VecEnv steps a number of these at once and starts a finished game's next game straight away, so every step gives
+an observation for every game, as batched arrays.
+"""
+
+
+class Env(object):
+
+    def __init__(self, players, heuristics=None, seats=(0,), seed=None, log=None):
+        self.players = list(players)
+        self.heuristics = list(heuristics) if heuristics is not None else ["Role"] * len(self.players)
+        self.seats = frozenset(seats)  # Player ids played from outside
+        if not self.seats or not self.seats <= set(range(0, len(self.players))):
+            raise ValueError("seats must be one or more player ids")
+        self.GP = sh.GamePlayer(self.players, False, False, False, 0, log if log is not None else gamelog.GameLog(),
+                                seed, heuristics=self.heuristics)
+        self.game = None  # The running game, a generator which stops at each controlled decision
+        self.player = None  # Player id deciding now
+        self.mask = None
+        self.seatRewards = [0] * features.MAX_PLAYERS
+        self.done = True
+
+    def reset(self):
+        row, mask = self.start()
+        return np.array(row, dtype=np.float32), np.array(mask, dtype=bool)
+
+    def step(self, action):
+        result = self.advance(action)
+        if result is None:
+            return (np.zeros(features.FEATURES, dtype=np.float32), np.zeros(features.ACTIONS, dtype=bool),
+                    float(self.seatRewards[self.player]), True)
+        row, mask = result
+        return np.array(row, dtype=np.float32), np.array(mask, dtype=bool), 0.0, False
+
+    # Plays new games until one reaches a controlled decision (a controlled seat may never get one in a short game).
+    # Returns the observation and mask as lists.
+    def start(self):
+        while True:
+            self.GP.reset()
+            self.game = self.play()
+            self.seatRewards = [0] * features.MAX_PLAYERS
+            self.done = False
+            result = next(self.game, None)
+            if result is not None:
+                self.mask = result[1]
+                return result
+            self.done = True
+
+    # Takes the action and plays on. Returns the next observation and mask as lists, None once the game is over.
+    def advance(self, action):
+        if self.done:
+            raise ValueError("the game is over, reset to start the next one")
+        action = toAction(action)
+        if not 0 <= action < features.ACTIONS or not self.mask[action]:
+            raise ValueError("action " + str(action) + " is not legal here")
+        try:
+            result = self.game.send(action)
+        except StopIteration:
+            self.done = True
+            self.mask = None
+            return None
+        self.mask = result[1]
+        return result
+
+    # One game, following GamePlayer.game, yielding (observation, mask) for each decision of a controlled seat and
+    # being sent back the action.
+    def play(self):
+        GP = self.GP
+        GP.setupGame()
+        GB = GP.GB
+        while True:
+            GP.roundStart()
+            GP.statusUpdate()
+            GP.president = GP.callIdDict(GB.state.president)
+            candidateList = GB.state.playerDict
+            if GP.president.getId() in self.seats:
+                self.player = GP.president.getId()
+                action = yield (features.encode(GB, GP.president, features.ELECT),
+                                features.electionMask(GP.president, candidateList))
+                GB.state.chancellor = action
+            else:
+                GP.president.elect(candidateList)
+            GP.elected()
+            GP.statusUpdate()
+
+            GP.markState()
+            if GP.chancellor.getId() in self.seats:
+                self.player = GP.chancellor.getId()
+                row = features.encode(GB, GP.chancellor, features.ENACT)
+                hand = GP.chancellor.drawCards()
+                liberalCards = sum(1 for x in hand if x is sh.LIBERAL)
+                features.setHand(row, liberalCards)
+                action = yield row, features.handMask(liberalCards, len(hand))
+                x = hand.index(sh.LIBERAL if action == features.PLAY_LIBERAL else sh.FASCIST)
+                GP.chancellor.discard(hand[:x] + hand[x + 1:])  # As the outcome handOutcomes gives for hand[x]
+                GP.chancellor.play(hand[x])
+            else:
+                GP.chancellor.drawAndChoose()
+            if GB.listening:
+                GP.broadcast()
+            GP.enacted()
+            GP.statusUpdate()
+            GP.newPres()
+            if GP.gameOver():
+                break
+        GP.endGame()
+
+        liberalWin = GB.state.playedLib > GB.state.playedFas
+        for seat in self.seats:
+            self.seatRewards[seat] = 1 if (GB.state.player(seat).role == "Liberal") == liberalWin else -1
+
+
+# Actions are stored on the board, which only takes plain ints as player ids, so NumPy integers (from argmax or a
+# random choice) are turned into ints. Anything that isn't a whole number raises a ValueError.
+def toAction(action):
+    try:
+        return operator.index(action)
+    except TypeError:
+        raise ValueError("action " + str(action) + " is not an integer")
+
+
+"""
+The Vec Env holds count environments with the same players and controlled seats, each seeded from seed and its
+position. Arrays are made once and filled in place on every step, copy them to keep them past the next step:
+
+    observations  float32 (count, FEATURES)
+    masks         bool (count, ACTIONS)
+    rewards       float32 (count,)               Reward of the action just taken in each game
+    dones         bool (count,)                  The game just ended, its row is already the next game's start
+    seatRewards   float32 (count, MAX_PLAYERS)   Every controlled seat's result for the games that just ended
+    players       int8 (count,)                  Player id deciding now in each game
+"""
+
+
+class VecEnv(object):
+
+    def __init__(self, count, players, heuristics=None, seats=(0,), seed=None):
+        self.envs = [Env(players, heuristics, seats, tournament.chunkSeed(seed, x) if seed is not None else None)
+                     for x in range(0, count)]
+        self.observations = np.zeros((count, features.FEATURES), dtype=np.float32)
+        self.masks = np.zeros((count, features.ACTIONS), dtype=bool)
+        self.rewards = np.zeros(count, dtype=np.float32)
+        self.dones = np.zeros(count, dtype=bool)
+        self.seatRewards = np.zeros((count, features.MAX_PLAYERS), dtype=np.float32)
+        self.players = np.zeros(count, dtype=np.int8)
+        self.games = 0  # Games finished
+
+    def __len__(self):
+        return len(self.envs)
+
+    def reset(self):
+        for x, env in enumerate(self.envs):
+            self.observations[x], self.masks[x] = env.start()
+            self.players[x] = env.player
+        self.rewards[:] = 0
+        self.dones[:] = False
+        self.seatRewards[:] = 0
+        return self.observations, self.masks
+
+    # actions has one action for each game. Any ValueError for an illegal action is raised before anything else moves.
+    def step(self, actions):
+        actions = [toAction(x) for x in actions]
+        for env, action in zip(self.envs, actions):
+            if not 0 <= action < features.ACTIONS or not env.mask[action]:
+                raise ValueError("action " + str(action) + " is not legal here")
+        self.rewards[:] = 0
+        self.dones[:] = False
+        self.seatRewards[:] = 0
+        for x, env in enumerate(self.envs):
+            result = env.advance(actions[x])
+            if result is None:
+                self.rewards[x] = env.seatRewards[env.player]
+                self.dones[x] = True
+                self.seatRewards[x] = env.seatRewards
+                self.games += 1
+                result = env.start()
+            self.observations[x], self.masks[x] = result
+            self.players[x] = env.player
+        return self.observations, self.masks, self.rewards, self.dones
@@ -0,0 +1,110 @@
+import belief
+
+"""
+Features turn a decision point of a game into fixed size arrays for training, the same size for every table from 5 to
+10 players. A decision point is a president electing a chancellor (ELECT) or a chancellor playing one card of their
+hand (ENACT), seen from the player making it. Everything a row holds is what that player could know at the time: the
+public fields of the state code, their own role, the roles they can see (see belief.knowsRoles) and, when enacting,
+their hand. The deck order and anybody else's role are never in it.
+
+The state is laid out as LAYOUT, one-hot apart from the two pile sizes, which are packed as fractions of the full deck:
+
+    players      Players at the table, 5 to 10
+    kind         ELECT or ENACT
+    actor        Player id making the decision
+    actorRole    Their role, Liberal, Fascist or Hitler
+    knownRoles   Role of every player id the actor knows, 3 to a player, all zero where they don't
+    deck         Cards left in the deck / 17
+    discard      Cards in the discard pile / 17
+    playedLib    Liberal policies played, 0 to 5
+    playedFas    Fascist policies played, 0 to 5
+    president    Player id
+    chancellor   Player id, all zero when electing
+    termLimited  Player id, all zero for nobody
+    hand         Liberal cards in the chancellor's hand, 0 to 3, all zero when electing
+
+Actions share one space of ACTIONS: electing player x is action x and playing a policy is PLAY_LIBERAL or PLAY_FASCIST.
+The legal mask has a one for every action the player could have taken.
+"""
+
+MAX_PLAYERS = 10
+MIN_PLAYERS = 5
+DECK_SIZE = 17
+
+ELECT = 0
+ENACT = 1
+
+PLAY_LIBERAL = MAX_PLAYERS
+PLAY_FASCIST = MAX_PLAYERS + 1
+ACTIONS = MAX_PLAYERS + 2
+
+ROLES = ("Liberal", "Fascist", "Hitler")
+
+LAYOUT = [("players", MAX_PLAYERS - MIN_PLAYERS + 1), ("kind", 2), ("actor", MAX_PLAYERS), ("actorRole", 3),
+          ("knownRoles", MAX_PLAYERS * 3), ("deck", 1), ("discard", 1), ("playedLib", 6), ("playedFas", 6),
+          ("president", MAX_PLAYERS), ("chancellor", MAX_PLAYERS), ("termLimited", MAX_PLAYERS), ("hand", 4)]
+
+OFFSETS = {}
+FEATURES = 0
+for name, width in LAYOUT:
+    OFFSETS[name] = FEATURES
+    FEATURES += width
+
+
+def seat(x):
+    return x if isinstance(x, int) else None
+
+
+# The state as the actor sees it, a list of FEATURES floats. The hand is added with setHand once it is known.
+def encode(GB, actor, kind):
+    state = GB.state
+    row = [0.0] * FEATURES
+    row[OFFSETS["players"] + state.players - MIN_PLAYERS] = 1.0
+    row[OFFSETS["kind"] + kind] = 1.0
+    row[OFFSETS["actor"] + actor.getId()] = 1.0
+    row[OFFSETS["actorRole"] + ROLES.index(actor.role)] = 1.0
+    if belief.knowsRoles(actor.role, state.players):
+        for player in state.roster:
+            row[OFFSETS["knownRoles"] + player.getId() * 3 + ROLES.index(player.role)] = 1.0
+    else:
+        row[OFFSETS["knownRoles"] + actor.getId() * 3 + ROLES.index(actor.role)] = 1.0
+    row[OFFSETS["deck"]] = len(state.deck) / DECK_SIZE
+    row[OFFSETS["discard"]] = len(state.discardDeck) / DECK_SIZE
+    row[OFFSETS["playedLib"] + min(state.playedLib, 5)] = 1.0
+    row[OFFSETS["playedFas"] + min(state.playedFas, 5)] = 1.0
+    for name, value in (("president", state.president), ("chancellor", state.chancellor),
+                        ("termLimited", state.termLimited)):
+        if seat(value) is not None:
+            row[OFFSETS[name] + value] = 1.0
+    return row
+
+
+def setHand(row, liberalCards):
+    row[OFFSETS["hand"] + liberalCards] = 1.0
+
+
+# Legal mask of an election, the chancellors of the president's generatePSCElection outcomes: every candidate but the
+# president. Worked out straight from the candidates rather than by making every outcome's state code.
+def electionMask(president, candidateList):
+    mask = [0] * ACTIONS
+    for id in candidateList.values():
+        mask[id] = 1
+    mask[president.GB.state.president] = 0
+    return mask
+
+
+# Legal mask of a hand, given how many of its cards are Liberal. Every card of the hand is one of generatePSCHand's
+# outcomes, so a policy can be played if it is in the hand at all.
+def handMask(liberalCards, cards=3):
+    mask = [0] * ACTIONS
+    if liberalCards > 0:
+        mask[PLAY_LIBERAL] = 1
+    if liberalCards < cards:
+        mask[PLAY_FASCIST] = 1
+    return mask
+
+
+# The (start, end) columns of one part of the layout, for picking it out of a features array.
+def columns(name):
+    start = OFFSETS[name]
+    return start, start + dict(LAYOUT)[name]
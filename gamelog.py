@@ -0,0 +1,181 @@
+import collections
+import json
+import sys
+
+"""
+The Game Log replaces printing straight to the console during a game. The game hands typed events to the log and the
+log passes them on to any sinks which want that level of detail, such as the console, a JSONL file or an in memory
+ring buffer. With no sinks attached nothing is built at all, the game only checks log.enabled(level) before making an
+event, so headless runs don't pay for output nobody reads.
+
+State codes are built lazily. An event holds on to the live GameState and only calls createString if a sink actually
+asks for event.stateCode. Sinks which keep events around call freeze() first, which stores the cheap packed state key
+in place of the live state.
+"""
+
+DEBUG = 10  # Every status update, election and suspicion table
+INFO = 20  # Game and round starts, policies enacted and reshuffles
+RESULT = 30  # The end of each game
+OFF = 100
+
+# Event kinds
+GAME_START = "game_start"
+STATUS = "status"
+ROUND_START = "round_start"
+ELECTION = "election"
+POLICY_ENACTED = "policy_enacted"
+RESHUFFLE = "reshuffle"
+GAME_END = "game_end"
+SUSPICION = "suspicion"
+
+
+class Event(object):
+
+    def __init__(self, kind, level, state, game, round, **data):
+        self.kind = kind
+        self.level = level
+        self.state = state
+        self.game = game
+        self.round = round
+        self.data = data
+        self.key = None
+        self.code = None
+
+    # Only built the first time it is asked for.
+    @property
+    def stateCode(self):
+        if self.code is None:
+            if self.state is not None:
+                self.code = self.state.createString()
+            elif self.key is not None:
+                from SecretHitler import keyToString  # Imported here as SecretHitler imports this module
+                self.code = keyToString(self.key)
+        return self.code
+
+    # Detaches the event from the live state so it can be kept after the game has moved on.
+    def freeze(self):
+        if self.state is not None:
+            if self.code is None:
+                self.key = self.state.createKey()
+            self.state = None
+        return self
+
+    def toDict(self):
+        event = {"kind": self.kind, "game": self.game, "round": self.round, "state": self.stateCode}
+        event.update(self.data)
+        return event
+
+
+class GameLog(object):
+
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks or [])
+        self.level = OFF
+        self.updateLevel()
+
+    def addSink(self, sink):
+        self.sinks.append(sink)
+        self.updateLevel()
+
+    # The log level is the lowest level any sink wants, anything below that is never made into an event.
+    def updateLevel(self):
+        self.level = min([sink.level for sink in self.sinks] + [OFF])
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def emit(self, event):
+        for sink in self.sinks:
+            if event.level >= sink.level:
+                sink.handle(event)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+"""
+Sinks. Each one has a level and a handle function which is given every event at or above that level.
+"""
+
+
+class NullSink(object):
+
+    def __init__(self):
+        self.level = OFF
+
+    def handle(self, event):
+        pass
+
+    def close(self):
+        pass
+
+
+# Prints events in the same format the game used to print them in.
+class ConsoleSink(object):
+
+    def __init__(self, level=DEBUG, stream=None):
+        self.level = level
+        self.stream = stream or sys.stdout
+
+    def handle(self, event):
+        data = event.data
+        if event.kind == STATUS:
+            lines = ["Round: " + str(event.round) + " | SubRound: " + str(data["subround"]),
+                     "Current State: " + event.stateCode,
+                     "President: " + str(data["president"]) + "\nChancellor: " + str(data["chancellor"]),
+                     "---------------------------"]
+        elif event.kind == GAME_START:
+            lines = ["Game " + str(event.game) + " Starting"]
+        elif event.kind == ROUND_START:
+            lines = ["Round " + str(event.round) + " Starting"]
+        elif event.kind == ELECTION:
+            lines = [str(data["president"]) + " (" + str(data["role"]) + ") Elected " + str(data["chancellor"])]
+        elif event.kind == POLICY_ENACTED:
+            lines = [str(data["chancellor"]) + " Played " + str(data["policy"])]
+        elif event.kind == RESHUFFLE:
+            lines = ["Shuffling in Progress"]
+        elif event.kind == GAME_END:
+            lines = ["Liberal Policy Played = " + str(data["playedLib"]),
+                     "Fascist Policy Played = " + str(data["playedFas"]),
+                     "Lib Win" if data["winner"] == "Liberal" else "Fas Win"]
+        elif event.kind == SUSPICION:
+            lines = [str(data["player"]) + " " + str(data["sus"])]
+        else:
+            lines = [event.kind + " " + str(data)]
+        self.stream.write("\n".join(lines) + "\n")
+
+    def close(self):
+        self.stream.flush()
+
+
+# Writes one JSON object per event, one per line.
+class JsonlSink(object):
+
+    def __init__(self, path, level=INFO):
+        self.level = level
+        self.file = open(path, "a")
+
+    def handle(self, event):
+        self.file.write(json.dumps(event.toDict()) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+# Keeps the last capacity events in memory, useful for looking at what led up to a rare outcome.
+class RingBufferSink(object):
+
+    def __init__(self, capacity=1000, level=DEBUG):
+        self.level = level
+        self.events = collections.deque(maxlen=capacity)
+
+    def handle(self, event):
+        self.events.append(event.freeze())
+
+    def close(self):
+        pass
+
+
+# The log used when nothing else is given, it has no sinks so nothing is ever emitted.
+NULL_LOG = GameLog()
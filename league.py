@@ -0,0 +1,278 @@
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+
+import numpy as np
+
+import gamelog
+import SecretHitler as sh
+import tournament
+
+"""
+The League rates heuristics (see SecretHitler.HEURISTICS) against each other by playing them at the same tables. A
+matchup is a table of players with a heuristic for each seat, two agents sharing the table between them, and is played
+for a number of games like a Tournament, the chunks of every matchup being played spread over one pool of processes.
+
+There are two ways to pick matchups:
+
+ - roundRobin  Every pair of agents. Each pair plays two matchups with the seats split both ways when the table can't
+               be split evenly.
+ - swiss       A number of rounds, each pairing agents of similar rating who haven't met yet.
+
+Results go into a table on disk, one JSON line per matchup, written as soon as its games are done. A matchup already in
+the table is never played again, so adding an agent to a league which has been run before only plays the matchups
+which involve the new agent.
+
+Roles are dealt at random, so an agent plays both sides. Every agent has a rating for each side, fitted over all the
+games in the table. The chance of the Liberals winning a game is
+
+    1 / (1 + 10 ** -(difference / 400))
+
+where difference is bias plus the mean Liberal rating of the Liberal seats less the mean Fascist rating of the Fascist
+seats. bias takes up how much easier one side is to win than the other, so each side's ratings average 1500 and are
+only compared with each other. Ratings are fitted by maximum likelihood with a normal prior (prior is its standard
+deviation, which keeps the ratings of an agent with few games near the middle) and the bounds are z standard errors
+either side, from the curvature of the fit.
+
+    L = League(["Random", "Role", "Intelligent", "Bayesian"], "league.jsonl", players=7, games=1000, seed=1)
+    L.roundRobin()
+    L.report()
+"""
+
+SCALE = math.log(10) / 400  # Elo points to natural log odds
+SIDES = ("Liberal", "Fascist")
+
+
+class League(object):
+
+    def __init__(self, agents, path, players=7, games=1000, workers=None, seed=None, chunkSize=250, prior=350.0):
+        self.agents = list(agents)
+        for agent in self.agents:
+            if agent not in sh.HEURISTICS:
+                raise ValueError("unknown agent " + str(agent) + ", choose from " + ", ".join(sh.HEURISTICS))
+        self.path = path
+        self.players = players  # Table size
+        self.names = ["Player" + str(x) for x in range(0, players)]
+        self.games = games  # Games for each matchup
+        self.workers = workers or os.cpu_count()
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.chunkSize = chunkSize
+        self.prior = prior
+        self.table = {}  # Matchup key: row
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    self.table[matchupKey(row["heuristics"], row["games"])] = row
+
+    # The seats of the matchups between two agents, a list of heuristics for each. The pair is put in the order of
+    # agents first, so the same two agents always make the same matchups (and matchup keys) whichever way round they
+    # are given.
+    def pairMatchups(self, first, second):
+        if self.agents.index(first) > self.agents.index(second):
+            first, second = second, first
+        half = self.players // 2
+        matchups = [[first] * half + [second] * (self.players - half)]
+        if self.players - half != half:
+            matchups.append([first] * (self.players - half) + [second] * half)
+        return matchups
+
+    # Plays every matchup that isn't already in the table, writing each one as it finishes.
+    def evaluate(self, matchups):
+        todo = []
+        for heuristics in matchups:
+            key = matchupKey(heuristics, self.games)
+            if key not in self.table and key not in [matchupKey(x, self.games) for x in todo]:
+                todo.append(list(heuristics))
+
+        tasks = []
+        owners = []
+        for number, heuristics in enumerate(todo):
+            seed = tournament.chunkSeed(self.seed, matchupKey(heuristics, self.games))
+            chunk = 0
+            while chunk * self.chunkSize < self.games:
+                size = min(self.chunkSize, self.games - chunk * self.chunkSize)
+                tasks.append((self.names, heuristics, size, tournament.chunkSeed(seed, chunk)))
+                owners.append(number)
+                chunk += 1
+
+        rows = [{"heuristics": x, "games": self.games, "seed": tournament.chunkSeed(self.seed,
+                                                                                    matchupKey(x, self.games)),
+                 "libWinCount": 0, "gameCount": 0, "groups": {}} for x in todo]
+        remaining = [owners.count(x) for x in range(0, len(todo))]
+        if self.workers == 1:
+            self.collect(map(playChunk, tasks), owners, rows, remaining)
+        else:
+            with multiprocessing.Pool(self.workers) as pool:
+                self.collect(pool.imap(playChunk, tasks, chunksize=1), owners, rows, remaining)
+        return [self.table[matchupKey(x, self.games)] for x in matchups]
+
+    def collect(self, results, owners, rows, remaining):
+        with open(self.path, "a") as f:
+            for owner, groups in zip(owners, results):
+                row = rows[owner]
+                for key, (games, libWins) in groups.items():
+                    total = row["groups"].setdefault(key, [0, 0])
+                    total[0] += games
+                    total[1] += libWins
+                    row["gameCount"] += games
+                    row["libWinCount"] += libWins
+                remaining[owner] -= 1
+                if remaining[owner] == 0:
+                    self.table[matchupKey(row["heuristics"], row["games"])] = row
+                    f.write(json.dumps(row) + "\n")
+                    f.flush()
+
+    def roundRobin(self):
+        matchups = []
+        for first, second in itertools.combinations(self.agents, 2):
+            matchups.extend(self.pairMatchups(first, second))
+        self.evaluate(matchups)
+        return self.ratings()
+
+    # Each round sorts the agents by their mean rating over both sides and pairs each with the next best agent they
+    # haven't met yet, with the last agent sitting the round out if there are an odd number. Pairs whose matchups are
+    # all in the table already have met.
+    def swiss(self, rounds):
+        met = set()
+        for first, second in itertools.combinations(self.agents, 2):
+            if all(matchupKey(x, self.games) in self.table for x in self.pairMatchups(first, second)):
+                met.add(frozenset((first, second)))
+        for x in range(0, rounds):
+            ratings = self.ratings()
+            order = sorted(self.agents, key=lambda agent: -(ratings[agent]["Liberal"]["rating"] +
+                                                            ratings[agent]["Fascist"]["rating"]))
+            pairs = []
+            while len(order) > 1:
+                first = order.pop(0)
+                second = next((y for y in order if frozenset((first, y)) not in met), order[0])
+                order.remove(second)
+                met.add(frozenset((first, second)))
+                pairs.append((first, second))
+            matchups = []
+            for first, second in pairs:
+                matchups.extend(self.pairMatchups(first, second))
+            self.evaluate(matchups)
+        return self.ratings()
+
+    # Every game in the table between this league's agents, as (Liberal seats, Fascist seats, games, Liberal wins)
+    # with the seats of each side counted by agent.
+    def groups(self):
+        groups = []
+        for row in self.table.values():
+            if not set(row["heuristics"]) <= set(self.agents):
+                continue
+            for key, (games, libWins) in row["groups"].items():
+                lib, fas = json.loads(key)
+                groups.append((lib, fas, games, libWins))
+        return groups
+
+    # Rating, bounds and games of each agent on each side: {agent: {"Liberal": {...}, "Fascist": {...}}}, with the
+    # side bias under "bias".
+    def ratings(self, z=1.96):
+        groups = self.groups()
+        values, errors = fitRatings(groups, self.agents, self.prior)
+        ratings = {"bias": {"rating": values[0], "low": values[0] - z * errors[0], "high": values[0] + z * errors[0]}}
+        for number, agent in enumerate(self.agents):
+            ratings[agent] = {}
+            for offset, side in enumerate(SIDES):
+                index = 1 + 2 * number + offset
+                games = sum(x[2] * x[offset].get(agent, 0) for x in groups)
+                ratings[agent][side] = {"rating": 1500 + values[index], "low": 1500 + values[index] - z * errors[index],
+                                        "high": 1500 + values[index] + z * errors[index], "games": games}
+        return ratings
+
+    def report(self, z=1.96):
+        ratings = self.ratings(z)
+        for side in SIDES:
+            print(side)
+            for agent in sorted(self.agents, key=lambda x: -ratings[x][side]["rating"]):
+                rating = ratings[agent][side]
+                print("  " + agent.ljust(12) + ("%7.1f [%7.1f, %7.1f] " % (rating["rating"], rating["low"],
+                                                                         rating["high"])) +
+                      str(rating["games"]).rjust(8) + " seat games")
+        bias = ratings["bias"]
+        print("Side bias %.1f [%.1f, %.1f]" % (bias["rating"], bias["low"], bias["high"]))
+
+
+# The same seats and games always give the same key.
+def matchupKey(heuristics, games):
+    return json.dumps([list(heuristics), games])
+
+
+# Runs in the worker process. Returns {composition key: [games, Liberal wins]}, the key being the JSON of each side's
+# seats counted by agent.
+def playChunk(task):
+    players, heuristics, games, seed = task
+    GP = sh.GamePlayer(players, False, False, False, 0, gamelog.GameLog(), seed, heuristics=heuristics)
+    groups = {}
+    for x in range(0, games):
+        GP.game()
+        lib = {}
+        fas = {}
+        for player in GP.GB.state.roster:
+            side = lib if player.role == "Liberal" else fas
+            agent = heuristics[player.getId()]
+            side[agent] = side.get(agent, 0) + 1
+        group = groups.setdefault(json.dumps([lib, fas], sort_keys=True), [0, 0])
+        group[0] += 1
+        group[1] += GP.GB.state.playedLib > GP.GB.state.playedFas
+        GP.reset()
+    return groups
+
+
+# Fits the bias and every agent's ratings (as points from 1500, Liberal then Fascist for each agent) by Newton's
+# method. Returns the values and their standard errors.
+#
+# Only differences between ratings on the same side can be told apart by the games (adding to every Liberal rating and
+# taking it off the bias changes nothing), so the values returned are each side's ratings less that side's mean, and
+# the bias with both means added in. The errors are of those same values.
+def fitRatings(groups, agents, prior=350.0, iterations=100):
+    index = dict((agent, number) for number, agent in enumerate(agents))
+    X = np.zeros((len(groups), 1 + 2 * len(agents)))
+    games = np.zeros(len(groups))
+    wins = np.zeros(len(groups))
+    for number, (lib, fas, count, libWins) in enumerate(groups):
+        X[number, 0] = SCALE
+        for agent, seats in lib.items():
+            X[number, 1 + 2 * index[agent]] += SCALE * seats / sum(lib.values())
+        for agent, seats in fas.items():
+            X[number, 2 + 2 * index[agent]] -= SCALE * seats / sum(fas.values())
+        games[number] = count
+        wins[number] = libWins
+
+    precision = np.full(X.shape[1], 1.0 / prior ** 2)
+    precision[0] = 1e-9  # The bias has no prior to speak of
+    values = np.zeros(X.shape[1])
+    for x in range(0, iterations):
+        p = 1.0 / (1.0 + np.exp(-(X @ values)))
+        gradient = X.T @ (wins - games * p) - precision * values
+        hessian = X.T @ (X * (games * p * (1 - p))[:, None]) + np.diag(precision)
+        step = np.linalg.solve(hessian, gradient)
+        values += step
+        if np.abs(step).max() < 1e-6:
+            break
+    p = 1.0 / (1.0 + np.exp(-(X @ values)))
+    hessian = X.T @ (X * (games * p * (1 - p))[:, None]) + np.diag(precision)
+
+    centre = np.eye(X.shape[1])
+    for offset, sign in ((1, 1), (2, -1)):  # Liberal then Fascist ratings
+        columns = np.arange(offset, X.shape[1], 2)
+        centre[np.ix_(columns, columns)] -= 1.0 / len(columns)
+        centre[0, columns] = sign / len(columns)
+    covariance = centre @ np.linalg.inv(hessian) @ centre.T
+    return (centre @ values).tolist(), np.sqrt(np.diag(covariance)).tolist()
+
+
+if __name__ == "__main__":
+    L = League(["Random", "Role", "Intelligent", "Bayesian"], "league.jsonl", players=7, games=1000, seed=1)
+    L.roundRobin()
+    L.report()
@@ -0,0 +1,135 @@
+import collections
+import time
+
+import SecretHitler as sh
+
+"""
+The Profiler shows where the time goes inside a game without needing an external profiler. While it is enabled the
+main phases of the game are wrapped so that every call adds to a running total of wall time and call count, the number
+of candidate state codes each generate function returns is counted into a histogram, and so is the number of deck
+reshuffles in each game.
+
+Nothing is wrapped until enable() is called and disable() puts the original functions back, so leaving the profiler in
+the code costs nothing when it isn't switched on. Times are inclusive, generatePSCHand includes the createString calls
+it makes for example.
+
+    P = Profiler()
+    P.enable()
+    sh.GamePlayer(names, False, True, False, 100, gamelog.GameLog())
+    P.disable()
+    P.report()
+"""
+
+# (class, function) pairs which are timed.
+TIMED = [(sh.GamePlayer, "elect"), (sh.GamePlayer, "broadcast"), (sh.GamePlayer, "newPres"),
+         (sh.RandomPlayer, "drawAndChoose"), (sh.RolePlayer, "drawAndChoose"),
+         (sh.IntelligentRolePlayer, "drawAndChoose"), (sh.GameState, "createString"), (sh.GameState, "readString"),
+         (sh.GameState, "createKey"), (sh.GameState, "readKey")]
+
+# Timed as well, with the length of the list they return counted.
+SIZED = [(sh.Player, "generatePSCHand"), (sh.Player, "generatePSCElection")]
+
+
+class Profiler(object):
+
+    active = None  # Only one profiler can have the functions wrapped at a time
+
+    def __init__(self, keepGames=False):
+        self.timings = {}  # Name: [calls, seconds] over every game
+        self.histograms = {}  # Name: Counter of sizes over every game
+        self.gameCount = 0
+        self.keepGames = keepGames
+        self.games = []  # A record of every game, only kept if keepGames is set
+        self.lastGame = None
+        self.current = {"timings": {}, "histograms": {}}
+        self.originals = []
+
+    def enable(self):
+        if Profiler.active is not None:
+            raise RuntimeError("Another Profiler is already enabled")
+        Profiler.active = self
+        for cls, name in TIMED:
+            self.wrap(cls, name, False)
+        for cls, name in SIZED:
+            self.wrap(cls, name, True)
+        self.wrapGame()
+
+    def disable(self):
+        for cls, name, fn in reversed(self.originals):
+            setattr(cls, name, fn)
+        self.originals = []
+        Profiler.active = None
+
+    # Swaps the function on the class for one which records into whichever game is currently being played.
+    def wrap(self, cls, name, sized):
+        fn = cls.__dict__[name]
+        key = cls.__name__ + "." + name
+        profiler = self
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            timing = profiler.current["timings"].get(key)
+            if timing is None:
+                timing = profiler.current["timings"][key] = [0, 0.0]
+            timing[0] += 1
+            timing[1] += elapsed
+            if sized:
+                histogram = profiler.current["histograms"].get(key)
+                if histogram is None:
+                    histogram = profiler.current["histograms"][key] = collections.Counter()
+                histogram[len(result)] += 1
+            return result
+
+        self.originals.append((cls, name, fn))
+        setattr(cls, name, timed)
+
+    # Every game gets its own record which is added onto the totals once the game is over.
+    def wrapGame(self):
+        fn = sh.GamePlayer.__dict__["game"]
+        profiler = self
+
+        def game(GP, *args, **kwargs):
+            start = time.perf_counter()
+            result = fn(GP, *args, **kwargs)
+            profiler.current["timings"]["GamePlayer.game"] = [1, time.perf_counter() - start]
+            profiler.current["histograms"]["reshuffles"] = collections.Counter({GP.GB.reshuffles: 1})
+            profiler.endGame()
+            return result
+
+        self.originals.append((sh.GamePlayer, "game", fn))
+        sh.GamePlayer.game = game
+
+    def endGame(self):
+        self.merge(self.current)
+        self.gameCount += 1
+        self.lastGame = self.current
+        if self.keepGames:
+            self.games.append(self.current)
+        self.current = {"timings": {}, "histograms": {}}
+
+    # Adds a record (or the totals of another profiler, from toDict) onto the totals.
+    def merge(self, record):
+        for key, (calls, seconds) in record["timings"].items():
+            timing = self.timings.setdefault(key, [0, 0.0])
+            timing[0] += calls
+            timing[1] += seconds
+        for key, histogram in record["histograms"].items():
+            counter = self.histograms.setdefault(key, collections.Counter())
+            for size, count in histogram.items():
+                counter[int(size)] += count
+        self.gameCount += record.get("gameCount", 0)
+
+    def toDict(self):
+        return {"gameCount": self.gameCount, "timings": self.timings,
+                "histograms": dict((key, dict(counter)) for key, counter in self.histograms.items())}
+
+    def report(self):
+        print("Profile of " + str(self.gameCount) + " Games")
+        total = self.timings.get("GamePlayer.game", [0, 0.0])[1]
+        for key, (calls, seconds) in sorted(self.timings.items(), key=lambda x: -x[1][1]):
+            share = seconds / total * 100 if total else 0.0
+            print(key.ljust(36) + str(calls).rjust(10) + ("%10.3fs %5.1f%%" % (seconds, share)))
+        for key, counter in sorted(self.histograms.items()):
+            print(key + " " + str(dict(sorted(counter.items()))))
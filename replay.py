@@ -0,0 +1,160 @@
+import gamelog
+import SecretHitler as sh
+
+"""
+Replays rebuild a game that has already been played, so a rare outcome found in a long run can be looked at without
+running the whole batch again. There are two ways to get a game back:
+
+ - From its seed. A seeded GamePlayer gives every game its own seed (GamePlayer.gameSeed, also in the game_start
+   event) and playing that seed again with the same players and heuristics gives exactly the same game.
+ - From a recording. The ActionRecorder sink writes down the roles, seats, heuristic of each player, starting deck
+   and every action taken: who was elected, the deck after each reshuffle and which policy was played and discarded.
+   A Replay applies these straight onto the board without asking any Player what to do, so it can jump to any round
+   cheaply. The players are rebuilt with the heuristics that were recorded, the flags given to the Replay only count
+   for recordings made before heuristics were recorded.
+
+    recording = recordSeed(gameSeed, names, False, False, True)
+    R = Replay(recording, names, False, False, True)
+    GP = R.fastForward(4)  # The game at the start of round 4, ready to look at or carry on with R.play()
+"""
+
+
+# Game log sink which records the actions of every game it sees.
+class ActionRecorder(object):
+
+    def __init__(self):
+        self.level = gamelog.DEBUG  # Elections are debug events
+        self.recordings = []
+        self.current = None
+
+    def handle(self, event):
+        data = event.data
+        if event.kind == gamelog.GAME_START:
+            self.current = {"game": event.game, "seed": data["seed"], "seats": data["seats"], "roles": data["roles"],
+                            "heuristics": data["heuristics"], "deck": data["deck"], "actions": []}
+        elif self.current is None:
+            return
+        elif event.kind == gamelog.ELECTION:
+            self.current["actions"].append(["elect", int(event.state.chancellor)])
+        elif event.kind == gamelog.RESHUFFLE:
+            self.current["actions"].append(["reshuffle", data["deck"]])
+        elif event.kind == gamelog.POLICY_ENACTED:
+            policy = sh.LIBERAL.getId() if data["policy"] == "Liberal" else sh.FASCIST.getId()
+            self.current["actions"].append(["enact", policy, event.state.discardDeck.code()[-2:]])
+        elif event.kind == gamelog.GAME_END:
+            self.current["final"] = event.stateCode
+            self.recordings.append(self.current)
+            self.current = None
+
+    def close(self):
+        pass
+
+
+# Plays the game with the given seed again with the heuristics, recording it as it goes.
+def recordSeed(gameSeed, players, isRandom, isRole, isIntelligent, isMCTS=False, heuristics=None, isBayesian=False):
+    recorder = ActionRecorder()
+    GP = sh.GamePlayer(players, isRandom, isRole, isIntelligent, 0, gamelog.GameLog([recorder]), isMCTS=isMCTS,
+                       heuristics=heuristics, isBayesian=isBayesian)
+    GP.game(gameSeed)
+    return recorder.recordings[-1]
+
+
+class Replay(object):
+
+    def __init__(self, recording, players, isRandom, isRole, isIntelligent):
+        self.recording = recording
+        self.players = players
+        self.isRandom = isRandom
+        self.isRole = isRole
+        self.isIntelligent = isIntelligent
+        self.GP = None
+        self.position = 0  # Index of the next action to apply
+
+    # Sets the board up as it was at the start of the game. Roles and heuristics are given by player id, which is the
+    # order of the player list.
+    def start(self):
+        heuristics = self.recording.get("heuristics")
+        if heuristics is not None:  # Every player's type was recorded, None for a plain Player
+            flags = (False, False, False)
+        else:
+            flags = (self.isRandom, self.isRole, self.isIntelligent)
+        GP = sh.GamePlayer(self.players, *flags, 0, gamelog.GameLog(), heuristics=heuristics)
+        GP.GB = sh.GameBoard(self.players, *flags, GP.log, roles=self.recording["roles"], heuristics=heuristics)
+        GP.gameSeed = self.recording["seed"]
+        GP.GB.deck = sh.PolicyDeck(self.recording["deck"])
+        GP.GB.updateState()
+        if GP.GB.sus is not None:
+            for x in GP.GB.state.playerDict:
+                if isinstance(x, sh.IntelligentRolePlayer):
+                    x.populate()
+        GP.seats = [GP.callIdDict(x) for x in self.recording["seats"]]
+        GP.GB.seats = list(self.recording["seats"])
+        GP.GB.state.president = self.recording["seats"][0]
+        GP.president = GP.callIdDict(GP.GB.state.president)
+        self.GP = GP
+        self.position = 0
+        return GP
+
+    # Applies the actions of one round: the election, any reshuffle and the policy played.
+    def step(self):
+        GP = self.GP
+        state = GP.GB.state
+        actions = self.recording["actions"]
+
+        GP.president = GP.callIdDict(state.president)
+        state.chancellor = actions[self.position][1]
+        GP.chancellor = GP.callIdDict(state.chancellor)
+        self.position += 1
+        GP.markState()
+
+        if actions[self.position][0] == "reshuffle":
+            state.deck = sh.PolicyDeck(actions[self.position][1])
+            state.discardDeck = sh.PolicyDeck()
+            GP.GB.reshuffles += 1
+            self.position += 1
+
+        kind, policy, discard = actions[self.position]
+        state.deck.draw(3)
+        state.updateDiscardDeck(sh.PolicyDeck(discard))
+        state.updatePlayedCards(sh.POLICIES[policy])
+        self.position += 1
+
+        if GP.GB.listening:
+            GP.broadcast()
+        GP.newPres()
+
+    def finished(self):
+        return self.position >= len(self.recording["actions"])
+
+    # The game as it was at the start of the given round, before the election.
+    def fastForward(self, round):
+        if self.GP is None or self.GP.round > round:
+            self.start()
+        while self.GP.round < round and not self.finished():
+            self.step()
+        return self.GP
+
+    # Applies every action and checks the game ended in the state that was recorded.
+    def finish(self):
+        self.fastForward(len(self.recording["actions"]))
+        return self.GP.GB.state.createString() == self.recording["final"]
+
+    # Carries on from wherever the replay is with the players making their own choices again, until the game is won.
+    def play(self, log=None):
+        GP = self.GP
+        if log is not None:
+            GP.log = log
+            GP.GB.log = log
+        while GP.GB.state.playedLib < GP.wincon and GP.GB.state.playedFas < GP.wincon:
+            GP.roundStart()
+            GP.statusUpdate()
+            GP.elect()
+            GP.statusUpdate()
+            GP.markState()
+            GP.chancellor.drawAndChoose()
+            if GP.GB.listening:
+                GP.broadcast()
+            GP.enacted()
+            GP.statusUpdate()
+            GP.newPres()
+        return GP
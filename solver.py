@@ -0,0 +1,138 @@
+import fractions
+import functools
+import itertools
+import math
+
+import SecretHitler as sh
+
+"""
+The Solver works out the exact chance of each side winning a Random or Role game, and the expected number of rounds,
+instead of estimating them from simulated games. This is possible because in those games what happens each round only
+depends on a few things:
+
+ - The make up of the deck and discard pile. Decks are always a uniform shuffle so the hand drawn is hypergeometric,
+   and the order of the cards left behind is still uniform.
+ - The played cards, which also give the round number and so whose turn it is to be president.
+ - The faction of the president. Presidents elect anybody else at random, so the chancellor is a Fascist with a chance
+   that only depends on whether the president is one.
+ - The chancellor's faction, for Role players. generatePSCHand makes three candidates which each play a random card
+   from the hand, so a Role player holding j cards of their side plays one with chance 1 - ((3 - j) / 3) ^ 3. Random
+   players play each card of the hand with the same chance.
+
+Seats are a uniform shuffle of the roles, so every arrangement of Fascists around the table is equally likely. The
+solver goes through each arrangement and works out the rest with a memoised recursion over
+(played Liberal, played Fascist, deck Liberal, deck Fascist, discard Liberal, discard Fascist).
+
+By default the answer is exact, using fractions. Pass exact=False to use floats, which is faster.
+"""
+
+HAND = 3
+
+
+class Solver(object):
+
+    def __init__(self, players, isRandom, isRole, exact=True, libPol=6, fasPol=11, wincon=5):
+        if not (isRandom or isRole):
+            raise ValueError("Only Random and Role games can be solved")
+        self.players = players if isinstance(players, int) else len(players)
+        self.isRole = not isRandom and isRole
+        self.number = fractions.Fraction if exact else float
+        self.libPol = libPol
+        self.fasPol = fasPol
+        self.wincon = wincon
+        self.fascists = self.players - sh.ROLES[self.players]["Liberal"]
+
+    # Returns (chance the Liberals win, expected number of rounds) averaged over every seating arrangement.
+    def solve(self):
+        n = self.players
+        # Only the seats that can be president before the game must end matter.
+        presidents = min(n, 2 * self.wincon - 1)
+        arrangements = {}
+        for fascists in itertools.combinations(range(0, n), self.fascists):
+            seats = tuple(x in fascists for x in range(0, presidents))
+            arrangements[seats] = arrangements.get(seats, 0) + 1
+        total = sum(arrangements.values())
+
+        libWin = self.number(0)
+        rounds = self.number(0)
+        for seats, count in arrangements.items():
+            weight = self.number(count) / total
+            win, length = self.arrangement(seats)
+            libWin += weight * win
+            rounds += weight * length
+        return libWin, rounds
+
+    # Solves one seating arrangement, seats being True for the Fascist seats.
+    def arrangement(self, seats):
+        n = self.players
+        number = self.number
+        chanceFas = {False: number(self.fascists) / (n - 1), True: number(self.fascists - 1) / (n - 1)}
+
+        @functools.lru_cache(maxsize=None)
+        def value(pl, pf, dl, df, xl, xf):
+            if pl >= self.wincon:
+                return number(1), number(0)
+            if pf >= self.wincon:
+                return number(0), number(0)
+
+            if dl + df < HAND:  # Reshuffle
+                dl, df, xl, xf = dl + xl, df + xf, 0, 0
+
+            fasChancellor = chanceFas[seats[(pl + pf) % n]]
+            win = number(0)
+            length = number(1)
+            for k, handChance in self.hands(dl, df):
+                # Chance of the chancellor playing a Liberal policy from a hand with k Liberal cards
+                if self.isRole:
+                    playLib = (1 - fasChancellor) * hitChance(k, number) + fasChancellor * (1 - hitChance(HAND - k,
+                                                                                                         number))
+                else:
+                    playLib = number(k) / HAND
+                for lib, chance in ((True, playLib), (False, 1 - playLib)):
+                    chance = handChance * chance
+                    if chance == 0:
+                        continue
+                    nextWin, nextLength = value(pl + lib, pf + (not lib), dl - k, df - (HAND - k), xl + k - lib,
+                                                xf + (HAND - k) - (not lib))
+                    win += chance * nextWin
+                    length += chance * nextLength
+            return win, length
+
+        return value(0, 0, self.libPol, self.fasPol, 0, 0)
+
+    # Each possible number of Liberal cards in a hand with its chance.
+    def hands(self, dl, df):
+        total = math.comb(dl + df, HAND)
+        for k in range(0, HAND + 1):
+            ways = math.comb(dl, k) * math.comb(df, HAND - k)
+            if ways:
+                yield k, self.number(ways) / total
+
+
+# Chance a Role player holding j cards of their side plays one of them: at least one of the three random candidates
+# is one of those cards.
+def hitChance(j, number):
+    return 1 - (number(HAND - j) / HAND) ** HAND
+
+
+# Solves the game and plays it through the simulation engine, then prints both with the difference in standard errors.
+def crossCheck(players, isRandom, isRole, games=20000, seed=None, workers=None):
+    import tournament
+
+    libWin, rounds = Solver(players, isRandom, isRole, exact=False).solve()
+    names = players if not isinstance(players, int) else ["Player" + str(x) for x in range(0, players)]
+    T = tournament.Tournament(names, isRandom, isRole, False, games, workers=workers, seed=seed).run()
+
+    simulated = T.libWinCount / T.gameCount
+    error = (libWin * (1 - libWin) / T.gameCount) ** 0.5
+    print("Exact Liberal Win Chance " + str(libWin) + ", Expected Rounds " + str(rounds))
+    print("Simulated Liberal Win Rate " + str(simulated) + ", Mean Rounds " + str(T.roundCount / T.gameCount))
+    print("Difference in Standard Errors " + str((simulated - libWin) / error if error else 0.0))
+    return libWin, simulated
+
+
+if __name__ == "__main__":
+    for players in range(5, 11):
+        for name, flags in (("Random", (True, False)), ("Role", (False, True))):
+            libWin, rounds = Solver(players, *flags).solve()
+            print(str(players) + " " + name + " Liberal Win " + str(float(libWin)) + " Rounds " + str(float(rounds)))
@@ -0,0 +1,86 @@
+import math
+
+"""
+Stopping rules decide when enough games have been played to know the Liberal win rate well enough, instead of always
+playing a fixed number. GamePlayer and Tournament play games in batches and ask the rule after every batch.
+
+ - WilsonStop  Stops once the Wilson confidence interval of the win rate is narrower than a given width.
+ - SPRT        Sequential probability ratio test of whether the win rate is above or below a threshold. Stops as soon
+               as either is clear, which for lopsided matchups takes very few games.
+
+Both have done(wins, games) and result(wins, games), the second giving the games used, the interval and, for the SPRT,
+the decision.
+
+    GP = GamePlayer(names, False, True, False, games=None, stop=WilsonStop(0.02))
+    GP.stopResult  # {"games": ..., "interval": (low, high), "decision": None}
+"""
+
+
+# Wilson score interval (low, high) for wins out of games, z standard errors wide on each side. Unlike the normal
+# approximation it stays inside 0 to 1 and behaves for win rates close to either end.
+def wilson(wins, games, z=1.96):
+    if games == 0:
+        return 0.0, 1.0
+    rate = wins / games
+    z2 = z * z
+    centre = (rate + z2 / (2 * games)) / (1 + z2 / games)
+    spread = z * math.sqrt(rate * (1 - rate) / games + z2 / (4 * games * games)) / (1 + z2 / games)
+    return max(0.0, centre - spread), min(1.0, centre + spread)
+
+
+class WilsonStop(object):
+
+    def __init__(self, width=0.02, z=1.96, minGames=100):
+        self.width = width  # Full width of the interval, high - low
+        self.z = z
+        self.minGames = minGames  # Very small samples can give a misleadingly narrow interval
+
+    def done(self, wins, games):
+        if games < self.minGames:
+            return False
+        low, high = wilson(wins, games, self.z)
+        return high - low <= self.width
+
+    def decision(self, wins, games):
+        return None
+
+    def result(self, wins, games):
+        return {"games": games, "interval": wilson(wins, games, self.z), "decision": self.decision(wins, games)}
+
+
+# Tests the win rate being threshold - delta against it being threshold + delta, with error rates alpha of wrongly
+# deciding "above" and beta of wrongly deciding "below". Rates within delta of the threshold take the most games.
+class SPRT(WilsonStop):
+
+    def __init__(self, threshold=0.5, delta=0.02, alpha=0.05, beta=0.05, z=1.96, minGames=0):
+        super().__init__(None, z, minGames)
+        if not delta > 0:
+            raise ValueError("delta must be more than 0")
+        if not 0 < threshold - delta or not threshold + delta < 1:
+            raise ValueError("threshold - delta and threshold + delta must both be between 0 and 1, not " +
+                             str(threshold - delta) + " and " + str(threshold + delta))
+        if not 0 < alpha < 1 or not 0 < beta < 1:
+            raise ValueError("alpha and beta must be between 0 and 1")
+        self.low = threshold - delta
+        self.high = threshold + delta
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+
+    # Log likelihood ratio of the high rate over the low rate.
+    def ratio(self, wins, games):
+        return (wins * math.log(self.high / self.low) +
+                (games - wins) * math.log((1 - self.high) / (1 - self.low)))
+
+    # "above" or "below" the threshold, None until one is clear.
+    def decision(self, wins, games):
+        if games < self.minGames:
+            return None
+        ratio = self.ratio(wins, games)
+        if ratio >= self.upper:
+            return "above"
+        if ratio <= self.lower:
+            return "below"
+        return None
+
+    def done(self, wins, games):
+        return self.decision(wins, games) is not None
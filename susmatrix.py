@@ -0,0 +1,95 @@
+import numpy as np
+
+"""
+The Sus Matrix holds every Intelligent Player's sus values for a game in one N x N array owned by the board. Row is the
+player holding the sus, column is the player they suspect, indexed by player id. A broadcast is then a single update of
+the chancellor's column (every row except the chancellor's own) and an election is an argmin or argmax along the
+president's row.
+
+The functions work on any number of games at once. values may have leading batch dimensions, (games, N, N) for a batch
+of games, with the other arguments given per game. SusMatrix wraps them for the single game of a GameBoard.
+"""
+
+
+# Whole numbers unless any of the parameters are floats, so sus stays an int for the usual weights. 32 bits is far
+# more than any game can reach and keeps large batches small.
+def susDtype(*params):
+    if all(x is None or isinstance(x, (int, np.integer)) for x in params):
+        return np.int32
+    return np.float64
+
+
+# Adds libWeight (played 1) or fasWeight (played 2) onto every other player's sus of the chancellor, not going below
+# floor. Games where active is False are left alone.
+def update(values, chancellor, played, libWeight=-2, fasWeight=5, floor=0, active=None):
+    n = values.shape[-1]
+    lead = values.shape[:-2]
+    flat = values.reshape((-1, n, n))  # A view, so the update lands in values
+    rows = np.arange(flat.shape[0])[:, None]
+    holders = np.arange(n)[None, :]
+    chancellor = np.broadcast_to(chancellor, lead).reshape((-1, 1))
+    played = np.broadcast_to(played, lead).reshape((-1, 1))
+
+    mask = holders != chancellor
+    if active is not None:
+        mask = mask & np.broadcast_to(active, lead).reshape((-1, 1))
+    column = flat[rows, holders, chancellor]
+    updated = column + np.where(played == 1, libWeight, fasWeight).astype(values.dtype)
+    if floor is not None:
+        updated = np.maximum(updated, floor)
+    flat[rows, holders, chancellor] = np.where(mask, updated, column)
+
+
+# The player each holder elects: the least sus if lowest is True, the most sus otherwise. The holder themselves and
+# excluded (the term limited player, -1 for nobody) are never picked. Ties go to whoever comes first in order, a list
+# of player ids (per game for a batch), or the lowest player id without one.
+def pick(values, holder, lowest, excluded=-1, order=None):
+    n = values.shape[-1]
+    lead = values.shape[:-2]
+    flat = values.reshape((-1, n, n))
+    rows = np.arange(flat.shape[0])
+    holder = np.broadcast_to(holder, lead).reshape((-1, 1))
+    lowest = np.broadcast_to(lowest, lead).reshape(-1)
+    excluded = np.broadcast_to(excluded, lead).reshape((-1, 1))
+    if order is None:
+        order = np.arange(n)
+    order = np.broadcast_to(order, lead + (n,)).reshape((-1, n))
+
+    row = flat[rows[:, None], holder, order].astype(np.float64)  # Sus of each player in tie order
+    invalid = (order == holder) | (order == excluded)
+    least = np.where(invalid, np.inf, row).argmin(axis=1)
+    most = np.where(invalid, -np.inf, row).argmax(axis=1)
+    return order[rows, np.where(lowest, least, most)].reshape(lead)
+
+
+# A single game. Works on the array directly rather than through the batch functions, which cost more than they save
+# on one small matrix.
+class SusMatrix(object):
+
+    __slots__ = ("values", "order")
+
+    def __init__(self, players, dtype=np.int32, order=None):
+        self.values = np.zeros((players, players), dtype=dtype)
+        self.order = list(range(0, players)) if order is None else list(order)  # Tie order for pick
+
+    def update(self, chancellor, played, libWeight=-2, fasWeight=5, floor=0):
+        column = self.values[:, chancellor]  # A view of the chancellor's column
+        own = column[chancellor]
+        column += libWeight if played == 1 else fasWeight
+        if floor is not None:
+            np.maximum(column, floor, out=column)
+        column[chancellor] = own
+
+    def pick(self, holder, lowest, excluded=None):
+        row = self.values[holder].tolist()
+        candidates = [x for x in self.order if x != holder and x != excluded]
+        if lowest:
+            return min(candidates, key=row.__getitem__)
+        return max(candidates, key=row.__getitem__)
+
+    # One holder's sus of every player as python numbers.
+    def row(self, holder):
+        return self.values[holder].tolist()
+
+    def reset(self, holder):
+        self.values[holder] = 0
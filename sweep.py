@@ -0,0 +1,188 @@
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+
+import stopping
+import tournament
+
+"""
+The Sweep searches over the sus parameters of the Intelligent Players (see SecretHitler.setSusParams) for the ones which
+give the best win rate to one side. Every configuration is played as a Tournament, with the chunks of every
+configuration being tried spread over a single pool of processes.
+
+There are three ways to pick configurations:
+
+ - grid             Every combination of the values given in the space.
+ - randomSearch     A number of configurations drawn at random from the space.
+ - successiveHalving  Plays every configuration for a few games, keeps the best 1 / eta of them and plays those again
+                    with eta times as many games, until one is left. Clearly bad configurations are dropped early
+                    without spending many games on them.
+
+Results go into a table on disk, one JSON line per configuration per rung (rung 0 for grid and random searches). A
+line is written as soon as its games are done and anything already in the table is never played again, so a sweep
+which was stopped can simply be run again to carry on. The win rate of a configuration is over all of its rungs,
+with a Wilson confidence interval.
+
+    space = {"libWeight": [-4, -2, -1], "fasWeight": [3, 5, 8], "fasElect": ["min", "max"]}
+    S = Sweep(names, space, "sweep.jsonl", seed=1)
+    S.successiveHalving(minGames=200)
+    S.report()
+"""
+
+
+class Sweep(object):
+
+    def __init__(self, players, space, path, games=1000, workers=None, seed=None, chunkSize=250, objective="Liberal"):
+        self.players = list(players)
+        self.space = space  # Parameter name: list of values, or a (low, high) range for randomSearch
+        self.path = path
+        self.games = games  # Games for each configuration in grid and random searches
+        self.workers = workers or os.cpu_count()
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.chunkSize = chunkSize
+        self.objective = objective  # The side whose win rate is being made as high as possible
+        self.table = {}  # (params key, rung): row
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    self.table[(paramsKey(row["params"]), row["rung"])] = row
+
+    # Plays every configuration that isn't already in the table at the given rung, writing each one as it finishes.
+    def evaluate(self, configs, games, rung=0):
+        todo = []
+        for params in configs:
+            key = paramsKey(params)
+            if (key, rung) not in self.table and key not in [paramsKey(x) for x in todo]:
+                todo.append(params)
+
+        tournaments = []
+        tasks = []
+        owners = []
+        for params in todo:
+            seed = tournament.chunkSeed(tournament.chunkSeed(self.seed, paramsKey(params)), rung)
+            T = tournament.Tournament(self.players, False, False, True, games, workers=1, seed=seed,
+                                      chunkSize=self.chunkSize, params=params)
+            for task in T.createTasks():
+                tasks.append(task)
+                owners.append(len(tournaments))
+            tournaments.append(T)
+
+        remaining = [owners.count(x) for x in range(0, len(tournaments))]
+        if self.workers == 1:
+            results = map(tournament.playChunk, tasks)
+            self.collect(results, owners, tournaments, remaining, rung)
+        else:
+            with multiprocessing.Pool(self.workers) as pool:
+                self.collect(pool.imap(tournament.playChunk, tasks, chunksize=1), owners, tournaments, remaining,
+                             rung)
+        return [self.summary(params, rung) for params in configs]
+
+    def collect(self, results, owners, tournaments, remaining, rung):
+        with open(self.path, "a") as f:
+            for owner, stats in zip(owners, results):
+                T = tournaments[owner]
+                T.merge(stats)
+                remaining[owner] -= 1
+                if remaining[owner] == 0:
+                    row = {"params": T.params, "rung": rung, "seed": T.seed, "libWinCount": T.libWinCount,
+                           "fasWinCount": T.fasWinCount, "gameCount": T.gameCount, "roundCount": T.roundCount}
+                    self.table[(paramsKey(T.params), rung)] = row
+                    f.write(json.dumps(row) + "\n")
+                    f.flush()
+
+    # Totals for one configuration over every rung in the table up to lastRung, with the objective's win rate and
+    # interval. Later rungs are left out while halving so a resumed sweep ranks configurations the same way again.
+    def summary(self, params, lastRung=None, z=1.96):
+        key = paramsKey(params)
+        summary = {"params": dict(params), "libWinCount": 0, "fasWinCount": 0, "gameCount": 0, "roundCount": 0,
+                   "rungs": 0}
+        for (rowKey, rung), row in self.table.items():
+            if rowKey == key and (lastRung is None or rung <= lastRung):
+                for name in ("libWinCount", "fasWinCount", "gameCount", "roundCount"):
+                    summary[name] += row[name]
+                summary["rungs"] += 1
+        wins = summary["libWinCount"] if self.objective == "Liberal" else summary["fasWinCount"]
+        summary["winRate"] = wins / summary["gameCount"] if summary["gameCount"] else 0.0
+        summary["interval"] = stopping.wilson(wins, summary["gameCount"], z)
+        return summary
+
+    def grid(self):
+        return self.evaluate(gridConfigs(self.space), self.games)
+
+    def randomSearch(self, samples, rng=None):
+        rng = rng or random.Random(tournament.chunkSeed(self.seed, "random"))
+        return self.evaluate(randomConfigs(self.space, samples, rng), self.games)
+
+    # Starts with the grid unless configurations are given. Returns the summaries of the last rung, best first.
+    def successiveHalving(self, configs=None, minGames=100, eta=3, maxRungs=None):
+        configs = list(configs) if configs is not None else gridConfigs(self.space)
+        games = minGames
+        rung = 0
+        while True:
+            summaries = self.evaluate(configs, games, rung)
+            summaries.sort(key=lambda x: x["winRate"], reverse=True)
+            keep = int(math.ceil(len(configs) / eta))
+            if len(configs) == 1 or (maxRungs is not None and rung + 1 >= maxRungs):
+                return summaries
+            configs = [x["params"] for x in summaries[:keep]]
+            games *= eta
+            rung += 1
+
+    # Every configuration in the table, best first.
+    def results(self):
+        seen = dict((key, row["params"]) for (key, rung), row in self.table.items())
+        summaries = [self.summary(params) for params in seen.values()]
+        summaries.sort(key=lambda x: x["winRate"], reverse=True)
+        return summaries
+
+    def report(self, top=10):
+        for summary in self.results()[:top]:
+            low, high = summary["interval"]
+            print(("%.4f [%.4f, %.4f] " % (summary["winRate"], low, high)) + str(summary["gameCount"]).rjust(7) +
+                  " games " + json.dumps(summary["params"], sort_keys=True))
+
+
+# The same parameters always give the same key, whatever order they were given in.
+def paramsKey(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def gridConfigs(space):
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*[space[x] for x in names])]
+
+
+# Lists are picked from, (low, high) ranges give a whole number if both ends are whole numbers and a float otherwise.
+def randomConfigs(space, samples, rng):
+    configs = []
+    for x in range(0, samples):
+        params = {}
+        for name in sorted(space):
+            values = space[name]
+            if isinstance(values, tuple):
+                low, high = values
+                if isinstance(low, int) and isinstance(high, int):
+                    params[name] = rng.randint(low, high)
+                else:
+                    params[name] = rng.uniform(low, high)
+            else:
+                params[name] = rng.choice(values)
+        configs.append(params)
+    return configs
+
+
+if __name__ == "__main__":
+    space = {"libWeight": [-4, -2, -1, 0], "fasWeight": [2, 5, 8], "susFloor": [0, None],
+             "libElect": ["min"], "fasElect": ["min", "max"]}
+    S = Sweep(["Finlay", "Callum", "Gareth", "Lucas", "Ollie"], space, "sweep.jsonl", seed=1)
+    S.successiveHalving(minGames=100)
+    S.report()
@@ -0,0 +1,27 @@
+import sys
+
+import asynchost
+
+# Answers the first few requests and then exits in the middle of a game.
+DYING_AGENT = """
+import json, sys
+for number, line in enumerate(sys.stdin):
+    if number == 20:
+        sys.exit(0)
+    request = json.loads(line)
+    sys.stdout.write(json.dumps({"id": request["id"], "choice": 0}) + "\\n")
+    sys.stdout.flush()
+"""
+
+
+def test_agent_exiting_mid_game_falls_back(tmp_path):
+    script = tmp_path / "agent.py"
+    script.write_text(DYING_AGENT)
+    agent = asynchost.PipeAgent([sys.executable, str(script)])
+    H = asynchost.Host(["Finlay", "Callum", "Gareth", "Lucas", "Ollie"], False, True, False, agents={0: agent},
+                       tables=50, timeout=0.5, seed=1)
+    H.play(200)
+    assert H.gameCount == 200
+    assert agent.closed
+    assert agent.requests > 20
+    assert agent.fallbacks >= agent.requests - 20
@@ -0,0 +1,25 @@
+import random
+
+import numpy as np
+
+import belief
+import SecretHitler as sh
+
+
+# The posterior before any policy is played is the prior, which has to match how often the board really deals each
+# player onto the Fascist side given the holder's own role.
+def test_prior_matches_seeded_deals():
+    names = ["Finlay", "Callum", "Gareth", "Lucas", "Ollie"]
+    holder = 0
+    seen = np.zeros(len(names))
+    deals = 0
+    for seed in range(0, 20000):
+        GB = sh.GameBoard(names, False, True, False, rng=random.Random(seed))
+        roles = [x.role for x in GB.playerList]
+        if roles[holder] != "Liberal":
+            continue
+        seen += [x != "Liberal" for x in roles]
+        deals += 1
+        if deals == 1:
+            expected = np.array(belief.Belief(roles).fascist(holder))
+    assert np.abs(seen / deals - expected).max() < 0.02
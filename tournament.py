@@ -0,0 +1,181 @@
+import multiprocessing
+import os
+import random
+
+import accumulators
+import gamelog
+import profiler
+import SecretHitler as sh
+import stopping
+
+"""
+The Tournament spreads a large number of games for one configuration of the game over a pool of processes. Games are
+split into fixed size chunks and every chunk seeds its own random stream from the tournament seed and its chunk number,
+so the same seed always gives the same results however many workers are used. Each game then gets its own seed from
+the chunk's stream, see GamePlayer.game. Once every chunk is done the win counts and other statistics from each
+GamePlayer are added together.
+
+params sets the sus parameters of the Intelligent Players in every worker, see SecretHitler.setSusParams.
+
+With a stopping rule (see stopping.py) chunks are handed out a wave at a time, one per worker, and the rule is asked
+after each chunk in chunk order. games is then the most that will be played, None for no limit. Chunks of the last
+wave after the rule is met are thrown away, so where it stops doesn't depend on the number of workers either.
+
+With stats every worker keeps a GameStats of its chunks (see accumulators.py) and they are merged into stats, so game
+lengths, reshuffles, seat and role win rates and more are reported however many games are played.
+"""
+
+
+class Tournament(object):
+
+    def __init__(self, players, isRandom, isRole, isIntelligent, games, workers=None, seed=None, chunkSize=1000,
+                 profile=False, cacheSize=0, params=None, stop=None, stats=True):
+        self.players = list(players)
+        self.isRandom = isRandom
+        self.isRole = isRole
+        self.isIntelligent = isIntelligent
+        self.games = games
+        self.workers = workers or os.cpu_count()
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.chunkSize = chunkSize
+        self.libWinCount = 0
+        self.fasWinCount = 0
+        self.gameCount = 0
+        self.roundCount = 0
+        self.reshuffleCount = 0
+        self.profile = profile
+        self.profiler = profiler.Profiler() if profile else None  # Totals of every chunk's profile
+        self.cacheSize = cacheSize  # Size of the outcome cache in each worker, 0 leaves it off
+        self.cacheHits = 0
+        self.cacheMisses = 0
+        self.params = dict(params or {})
+        self.stop = stop
+        if games is None and stop is None:
+            raise ValueError("games can only be None with a stopping rule")
+        self.stopResult = None  # Games used, interval and decision once a stopping rule is met
+        self.stats = accumulators.GameStats() if stats else None
+
+    # Every chunk is a task of (config, number of games, seed). The last chunk takes whatever is left over.
+    def createTasks(self, first=0, count=None):
+        config = (self.players, self.isRandom, self.isRole, self.isIntelligent, self.profile, self.cacheSize,
+                  self.params, self.stats is not None)
+        tasks = []
+        chunk = first
+        remaining = self.games - first * self.chunkSize if self.games is not None else None
+        while (remaining is None or remaining > 0) and (count is None or len(tasks) < count):
+            size = self.chunkSize if remaining is None else min(self.chunkSize, remaining)
+            tasks.append((config, size, chunkSeed(self.seed, chunk)))
+            if remaining is not None:
+                remaining -= size
+            chunk += 1
+        return tasks
+
+    def run(self):
+        if self.stop is not None:
+            return self.runUntilStopped()
+        tasks = self.createTasks()
+        if self.workers == 1:
+            results = [playChunk(task) for task in tasks]
+        else:
+            with multiprocessing.Pool(self.workers) as pool:
+                results = pool.map(playChunk, tasks, chunksize=1)
+        for stats in results:
+            self.merge(stats)
+        return self
+
+    def runUntilStopped(self):
+        pool = multiprocessing.Pool(self.workers) if self.workers > 1 else None
+        try:
+            chunk = 0
+            while True:
+                tasks = self.createTasks(chunk, self.workers)
+                if not tasks:
+                    break
+                results = pool.map(playChunk, tasks, chunksize=1) if pool else [playChunk(task) for task in tasks]
+                chunk += len(tasks)
+                for stats in results:
+                    self.merge(stats)
+                    if self.stop.done(self.libWinCount, self.gameCount):
+                        break
+                if self.stop.done(self.libWinCount, self.gameCount):
+                    break
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self.stopResult = self.stop.result(self.libWinCount, self.gameCount)
+        return self
+
+    # Adds the statistics of one chunk onto the tournament totals.
+    def merge(self, stats):
+        self.libWinCount += stats["libWinCount"]
+        self.fasWinCount += stats["fasWinCount"]
+        self.gameCount += stats["gameCount"]
+        self.roundCount += stats["roundCount"]
+        self.reshuffleCount += stats["reshuffleCount"]
+        if "profile" in stats:
+            self.profiler.merge(stats["profile"])
+        self.cacheHits += stats["cacheHits"]
+        self.cacheMisses += stats["cacheMisses"]
+        if "stats" in stats and self.stats is not None:
+            self.stats.merge(accumulators.GameStats.fromDict(stats["stats"]))
+
+    def getStats(self):
+        return {"libWinCount": self.libWinCount, "fasWinCount": self.fasWinCount, "gameCount": self.gameCount,
+                "roundCount": self.roundCount, "reshuffleCount": self.reshuffleCount}
+
+    # Wilson score interval for the Liberal win rate.
+    def getInterval(self, z=1.96):
+        return stopping.wilson(self.libWinCount, self.gameCount, z)
+
+    def getWinStats(self):
+
+        print("Liberal Win Count " + str(self.libWinCount))
+        print("Fascist Win Count " + str(self.fasWinCount))
+        print("Games Played " + str(self.gameCount))
+        if self.stopResult is not None:
+            print("Liberal Win Interval " + str(self.stopResult["interval"]) + ", Decision " +
+                  str(self.stopResult["decision"]))
+
+
+# String seeds are hashed by the random module, so each chunk gets an unrelated stream from the same tournament seed.
+def chunkSeed(seed, chunk):
+    return str(seed) + "/" + str(chunk)
+
+
+# Runs in the worker process. The games are given an empty log as nobody is watching the per round output.
+def playChunk(task):
+    config, games, seed = task
+    players, isRandom, isRole, isIntelligent, profile, cacheSize, params, collectStats = config
+    previousSize = sh.OUTCOMES.maxsize  # Put back afterwards, as with one worker this is the caller's own process
+    previous = sh.getSusParams()
+    sh.OUTCOMES.maxsize = cacheSize  # In a worker the cache carries over between chunks
+    sh.setSusParams(params)
+    hits = sh.OUTCOMES.hits
+    misses = sh.OUTCOMES.misses
+    if profile:
+        P = profiler.Profiler()
+        P.enable()
+    try:
+        GP = sh.GamePlayer(players, isRandom, isRole, isIntelligent, games, gamelog.GameLog(), seed,
+                           stats=accumulators.GameStats() if collectStats else None)
+    finally:
+        if profile:
+            P.disable()
+        sh.setSusParams(previous)
+        if multiprocessing.parent_process() is None:  # Run in the caller's process, which never asked for the cache
+            sh.OUTCOMES.resize(previousSize)
+    stats = {"libWinCount": GP.libWinCount, "fasWinCount": GP.fasWinCount, "gameCount": GP.gameCount,
+             "roundCount": GP.roundCount, "reshuffleCount": GP.reshuffleCount,
+             "cacheHits": sh.OUTCOMES.hits - hits, "cacheMisses": sh.OUTCOMES.misses - misses}
+    if profile:
+        stats["profile"] = P.toDict()
+    if GP.stats is not None:
+        stats["stats"] = GP.stats.toDict()
+    return stats
+
+
+if __name__ == "__main__":
+    T = Tournament(["Finlay", "Callum", "Gareth", "Lucas", "Ollie"], False, True, False, 10000, seed=1).run()
+    T.getWinStats()
+    T.stats.report()
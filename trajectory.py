@@ -0,0 +1,183 @@
+import mmap
+import struct
+
+import gamelog
+import SecretHitler as sh
+
+"""
+Trajectory files are a compact binary record of every game played, written by a sink on the game log so they can be
+analysed later without playing the games again. The file is a short header followed by fixed size records, one for
+each of these moments in a game:
+
+ - START     The seat order (player ids, president first) and the role of each player id.
+ - ELECTION  The state once the chancellor is elected, with the president and chancellor.
+ - ENACTED   The state once a policy is played, the policy, and for Intelligent games every player's sus values.
+ - END       The final state and the winner.
+
+Each record holds the packed state key (see SecretHitler.createKey) rather than a state code. As records are all the
+same size the reader can memory map the file and pick fields straight out of it, games are found by scanning one byte
+per record, so millions of games can be looked through without making a Python object for each one.
+
+    log = gamelog.GameLog([TrajectorySink("games.traj")])
+    sh.GamePlayer(names, False, False, True, 1000, log)
+    log.close()
+
+    for game in TrajectoryReader("games.traj").games(winner=sh.LIBERAL.getId()):
+        ...
+"""
+
+MAGIC = b"SHTRAJ01"
+HEADER = struct.Struct("<8sII")  # Magic, flags, record size
+FLAG_SUS = 1
+
+# Record kinds
+START = 0
+ELECTION = 1
+ENACTED = 2
+END = 3
+
+NO_SEAT = -1
+MAX_PLAYERS = 10
+
+# game, kind, round, president, chancellor, policy (winner in END records), state key, seats, roles
+RECORD = struct.Struct("<IBBbbB" + str(sh.KEY_BYTES) + "s10s10s")
+SUS = struct.Struct("<" + str(MAX_PLAYERS * MAX_PLAYERS) + "h")  # Row is the holder, column is the player suspected
+KIND_OFFSET = 4
+
+ROLES = {"Liberal": 0, "Fascist": 1, "Hitler": 2}
+ROLE_NAMES = dict((y, x) for x, y in ROLES.items())
+
+
+class TrajectorySink(object):
+
+    def __init__(self, path, sus=True, gameOffset=0):
+        self.level = gamelog.DEBUG  # Elections are debug events
+        self.sus = sus
+        self.gameOffset = gameOffset  # Added to game numbers, so files from different runs can have unique games
+        self.recordSize = RECORD.size + (SUS.size if sus else 0)
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, FLAG_SUS if sus else 0, self.recordSize))
+
+    def handle(self, event):
+        if event.kind == gamelog.GAME_START:
+            seats = bytes(event.data["seats"]).ljust(MAX_PLAYERS, b"\xff")
+            roles = bytes(ROLES[x] for x in event.data["roles"]).ljust(MAX_PLAYERS, b"\xff")
+            self.write(event, START, 0, seats, roles)
+        elif event.kind == gamelog.ELECTION:
+            self.write(event, ELECTION, 0)
+        elif event.kind == gamelog.POLICY_ENACTED:
+            self.write(event, ENACTED, sh.LIBERAL.getId() if event.data["policy"] == "Liberal" else sh.FASCIST.getId())
+        elif event.kind == gamelog.GAME_END:
+            self.write(event, END, sh.LIBERAL.getId() if event.data["winner"] == "Liberal" else sh.FASCIST.getId())
+
+    def write(self, event, kind, policy, seats=b"\xff" * MAX_PLAYERS, roles=b"\xff" * MAX_PLAYERS):
+        state = event.state
+        self.file.write(RECORD.pack(event.game + self.gameOffset, kind, event.round, seat(state.president),
+                                    seat(state.chancellor), policy, sh.keyToBytes(state.createKey()), seats, roles))
+        if self.sus:
+            self.file.write(SUS.pack(*susSnapshot(state)))
+
+    def close(self):
+        self.file.close()
+
+
+def seat(x):
+    if x is None or x == "X":
+        return NO_SEAT
+    return int(x)
+
+
+# Every player's sus values as a flat row by row list, zeros for anybody without any.
+def susSnapshot(state):
+    values = [0] * (MAX_PLAYERS * MAX_PLAYERS)
+    for player, holder in state.playerDict.items():
+        for other, value in getattr(player, "susDict", {}).items():
+            values[holder * MAX_PLAYERS + state.playerDict[other]] = max(-32768, min(32767, int(value)))
+    return values
+
+
+"""
+The Trajectory Reader maps a trajectory file into memory. Single records are only unpacked when asked for.
+"""
+
+
+class TrajectoryReader(object):
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, flags, self.recordSize = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(path + " is not a trajectory file")
+        self.hasSus = bool(flags & FLAG_SUS)
+        self.count = (len(self.map) - HEADER.size) // self.recordSize
+        self.kinds = None
+
+    def __len__(self):
+        return self.count
+
+    def offset(self, index):
+        return HEADER.size + index * self.recordSize
+
+    # One byte per record, taken straight out of the map with a stepped slice.
+    def kindColumn(self):
+        if self.kinds is None:
+            view = memoryview(self.map)[HEADER.size + KIND_OFFSET:]
+            self.kinds = bytes(view[::self.recordSize])[:self.count]
+            view.release()
+        return self.kinds
+
+    def record(self, index):
+        game, kind, round, president, chancellor, policy, key, seats, roles = RECORD.unpack_from(self.map,
+                                                                                                  self.offset(index))
+        record = {"game": game, "kind": kind, "round": round, "president": president, "chancellor": chancellor,
+                  "policy": policy, "key": sh.bytesToKey(key)}
+        if kind == START:
+            record["seats"] = [x for x in seats if x != 0xff]
+            record["roles"] = [ROLE_NAMES[x] for x in roles if x != 0xff]
+        return record
+
+    def stateCode(self, index):
+        return sh.keyToString(self.record(index)["key"])
+
+    def susMatrix(self, index):
+        if not self.hasSus:
+            return None
+        values = SUS.unpack_from(self.map, self.offset(index) + RECORD.size)
+        return [values[x:x + MAX_PLAYERS] for x in range(0, len(values), MAX_PLAYERS)]
+
+    def __iter__(self):
+        for index in range(0, self.count):
+            yield self.record(index)
+
+    # Yields (first, last) record indexes for each game, found from the START records.
+    def gameRanges(self):
+        kinds = self.kindColumn()
+        start = kinds.find(START)
+        while start != -1:
+            end = kinds.find(START, start + 1)
+            yield start, (end if end != -1 else self.count) - 1
+            start = end
+
+    # Yields the record range of every game which ends in the given winner (a policy id) and whose number of ENACTED
+    # records (its length in rounds) is within minRounds and maxRounds.
+    def games(self, winner=None, minRounds=None, maxRounds=None):
+        kinds = self.kindColumn()
+        for first, last in self.gameRanges():
+            if kinds[last] != END:
+                continue  # Cut short, the file was written part way through a game
+            if winner is not None and self.map[self.offset(last) + KIND_OFFSET + 4] != winner:
+                continue
+            if minRounds is not None or maxRounds is not None:
+                rounds = kinds.count(ENACTED, first, last)
+                if (minRounds is not None and rounds < minRounds) or (maxRounds is not None and rounds > maxRounds):
+                    continue
+            yield first, last
+
+    # The records of one game from gameRanges or games.
+    def game(self, first, last):
+        return [self.record(x) for x in range(first, last + 1)]
+
+    def close(self):
+        self.map.close()
+        self.file.close()